@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+BATCH_SIZES = (1, 8, 64)
+WARMUP_CALLS = 3
+TIMED_CALLS = int(os.getenv("BENCH_CALLS", "50"))
+
+
+def _ensure_src_path():
+    src_path = Path(__file__).resolve().parent / "src"
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _time_calls(fn, batch):
+    for _ in range(WARMUP_CALLS):
+        fn(batch)
+    timings = []
+    for _ in range(TIMED_CALLS):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[len(timings) // 2]
+
+
+def main() -> None:
+    _ensure_src_path()
+    import numpy as np
+
+    from deface_watcher.config import load_settings
+    from deface_watcher.services.artifacts import _load_keras_model, _load_numpy_model
+
+    settings = load_settings()
+    model, infer = _load_keras_model(settings)
+    numpy_infer = None
+    if settings.numpy_weights_path.exists():
+        _, numpy_infer = _load_numpy_model(settings)
+    rng = np.random.default_rng(42)
+    vocab_size = int(model.layers[0].input_dim)
+
+    print(f"{'batch':>5} | {'model.predict mean/p50 (ms)':>28} | {'traced fn mean/p50 (ms)':>24} | speedup")
+    for batch_size in BATCH_SIZES:
+        batch = rng.integers(0, vocab_size, size=(batch_size, settings.max_length), dtype=np.int32)
+        predict_mean, predict_p50 = _time_calls(lambda x: model.predict(x, verbose=0), batch)
+        traced_mean, traced_p50 = _time_calls(infer, batch)
+        line = (
+            f"{batch_size:>5} | {predict_mean:>13.2f} / {predict_p50:<12.2f} | "
+            f"{traced_mean:>10.2f} / {traced_p50:<11.2f} | {predict_mean / traced_mean:.1f}x"
+        )
+        if numpy_infer is not None:
+            numpy_mean, numpy_p50 = _time_calls(numpy_infer, batch)
+            line += f" | numpy {numpy_mean:.2f} / {numpy_p50:.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+TOP = int(os.getenv("BENCH_TOP", "15"))
+HEAVY_MODULES = ("tensorflow", "keras", "bs4", "numpy", "requests", "flask")
+
+
+def _ensure_src_path():
+    src_path = Path(__file__).resolve().parent / "src"
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _child() -> None:
+    start = time.perf_counter()
+    _ensure_src_path()
+    from deface_watcher.web import create_app
+
+    import_ms = (time.perf_counter() - start) * 1000
+    loaded_at_import = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+    app = create_app()
+    client = app.test_client()
+    health = client.get("/health")
+    health_ms = (time.perf_counter() - start) * 1000
+
+    from deface_watcher.services.startup import get_readiness, wait_ready
+
+    wait_ready()
+    ready_ms = (time.perf_counter() - start) * 1000
+    print(
+        json.dumps(
+            {
+                "import_ms": import_ms,
+                "health_ms": health_ms,
+                "health_status": health.status_code,
+                "ready_ms": ready_ms,
+                "readiness": get_readiness(),
+                "loaded_at_import": loaded_at_import,
+            }
+        )
+    )
+
+
+def _import_times():
+    # -X importtime writes "import time: self [us] | cumulative | imported package" to stderr.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import deface_watcher.web"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parent / "src")},
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name[1:]
+        rows.append((name.strip(), int(self_us), int(cumulative_us), name == name.lstrip()))
+    return rows
+
+
+def main() -> None:
+    rows = _import_times()
+    total_ms = sum(row[2] for row in rows if row[3]) / 1000
+
+    print(f"{'module':<48} | {'self (ms)':>9} | {'cumulative (ms)':>15}")
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: row[2], reverse=True)[:TOP]:
+        print(f"{name[:48]:<48} | {self_us / 1000:>9.1f} | {cumulative_us / 1000:>15.1f}")
+    print(f"\nmodules imported: {len(rows)}, total import time: {total_ms:.1f} ms")
+
+    output = subprocess.run(
+        [sys.executable, __file__, "--child"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"import deface_watcher.web: {result['import_ms']:.1f} ms")
+    print(f"/health answered:          {result['health_ms']:.1f} ms (status {result['health_status']})")
+    print(f"ready:                     {result['ready_ms']:.1f} ms (state {result['readiness']['state']})")
+    print(f"loaded by the import:      {', '.join(result['loaded_at_import']) or '-'}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--child":
+        _child()
+    else:
+        main()
@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LOADS = int(os.getenv("BENCH_LOADS", "5"))
+
+
+def _ensure_src_path():
+    src_path = Path(__file__).resolve().parent / "src"
+    if str(src_path) not in sys.path:
+        sys.path.insert(0, str(src_path))
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(kind: str, path: str) -> None:
+    _ensure_src_path()
+    from deface_watcher.services.tokenizer import VocabTokenizer
+
+    def load():
+        if kind == "json":
+            with open(path, "r", encoding="utf-8") as handle:
+                return VocabTokenizer.from_json(handle.read())
+        return VocabTokenizer.from_vocab_file(path)
+
+    rss_before = _rss_kb()
+    start = time.perf_counter()
+    tokenizer = load()
+    first_ms = (time.perf_counter() - start) * 1000
+    rss_after = _rss_kb()
+
+    timings = []
+    for _ in range(LOADS):
+        start = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(
+        json.dumps(
+            {
+                "first_load_ms": first_ms,
+                "avg_load_ms": sum(timings) / len(timings),
+                "rss_delta_kb": rss_after - rss_before,
+                "vocab_size": tokenizer.vocab_size,
+            }
+        )
+    )
+
+
+def _measure(kind: str, path: Path):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", kind, str(path)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    _ensure_src_path()
+    from deface_watcher.config import load_settings
+    from deface_watcher.services.tokenizer import write_vocab_artifact
+
+    settings = load_settings()
+    if not settings.tokenizer_path.exists():
+        print(f"ERROR: Missing tokenizer {settings.tokenizer_path}")
+        raise SystemExit(1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vocab_path = settings.vocab_path
+        if not vocab_path.exists():
+            with settings.tokenizer_path.open("r", encoding="utf-8") as handle:
+                config = json.load(handle)["config"]
+            vocab_path = Path(tmp_dir) / "tokenizer_vocab.bin"
+            write_vocab_artifact(
+                vocab_path,
+                json.loads(config["word_index"]),
+                num_words=config.get("num_words"),
+                oov_token=config.get("oov_token"),
+                filters=config.get("filters"),
+                lower=config.get("lower"),
+                split=config.get("split"),
+                char_level=config.get("char_level"),
+            )
+
+        print(f"{'artifact':>8} | {'size (KB)':>10} | {'first load (ms)':>15} | {'avg load (ms)':>13} | {'RSS +KB':>8} | vocab")
+        for kind, path in (("json", settings.tokenizer_path), ("vocab", vocab_path)):
+            result = _measure(kind, path)
+            print(
+                f"{kind:>8} | {path.stat().st_size / 1024:>10.1f} | {result['first_load_ms']:>15.2f} | "
+                f"{result['avg_load_ms']:>13.2f} | {result['rss_delta_kb']:>8} | {result['vocab_size']}"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from deface_watcher.config import load_settings
+from deface_watcher.services.metrics import reset_directory
+
+_settings = load_settings()
+_sidecar = None
+
+preload_app = _settings.preload_artifacts
+
+
+def on_starting(server):
+    global _sidecar
+    # Counters restart from zero with the server, as Prometheus expects.
+    reset_directory(_settings.metrics_dir)
+    if not _settings.inference_socket or not _settings.inference_sidecar_spawn:
+        return
+    _sidecar = subprocess.Popen([sys.executable, str(Path(__file__).resolve().parent / "inference_server.py")])
+    server.log.info("Inference sidecar started (pid=%s, socket=%s).", _sidecar.pid, _settings.inference_socket)
+
+
+def on_exit(server):
+    if _sidecar is not None and _sidecar.poll() is None:
+        _sidecar.terminate()
+        try:
+            _sidecar.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _sidecar.kill()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from deface_watcher.web import init_worker
+
+    init_worker()
+    server.log.info("Worker %s loading artifacts in the background.", worker.pid)
+
+
+def post_worker_init(worker):
+    # Job runners belong to server processes only, never to code that merely builds the app.
+    from deface_watcher.api import start_job_workers
+
+    start_job_workers()
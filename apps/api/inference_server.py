@@ -0,0 +1,11 @@
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from deface_watcher.services.inference_server import serve
+
+if __name__ == "__main__":
+    serve()
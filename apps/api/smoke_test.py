@@ -3,9 +3,38 @@ import sys
 from pathlib import Path
 
 
+TOKENIZER_CORPUS = [
+    "Hacked by Team XYZ!!! Your security is ZERO.",
+    "Welcome to our shop: best products, best prices; contact info@example.com",
+    "Trang chủ - Tin tức thể thao, thời sự hôm nay",
+    "ΟΔΟΣ ΣΟΦΟΚΛΕΟΥΣ ΣΣ Σ. İstanbul straße",
+]
+
+TOKENIZER_SAMPLES = TOKENIZER_CORPUS + [
+    "",
+    "   ",
+    "unknown words only qwerty asdf",
+    "tabs\tand\nnewlines\r\nmixed   spaces",
+    "ΟΔΟΣ " * 700,
+    " ".join(f"hacked{i} team" for i in range(900)),
+    "x" * 5000 + " hacked by team",
+    ("best products " * 150) + "Σ" * 3000 + " trang chủ",
+]
+
+HTML_SAMPLES = [
+    b"<html><head><title>Hacked</title><style>body{color:red}</style></head>"
+    b"<body><h1>Hacked by Team XYZ</h1><script>var a = '</div>';</script><p>Your security is ZERO</p></body></html>",
+    b"<!DOCTYPE html><!-- comment --><div>a<b>b</b>c<br/>d &amp; &nbsp;e&#233;</div><noscript><p>enable js</p></noscript>tail",
+    b"<SCRIPT type='text/javascript'>document.write('x')</SCRIPT><Style>p{}</Style>Upper <NoScript>hidden</NoScript>case",
+    b"<p>unclosed <div>tags <span>everywhere<script/>still text<noscript><noscript>nested</noscript>x</noscript>end",
+    '<meta charset="iso-8859-1"><p>Caf\u00e9 cr\u00e8me</p>'.encode("iso-8859-1"),
+    "<p>Trang chủ - Tin tức thể thao</p><![CDATA[ cdata ]]>".encode("utf-8"),
+    b"<body>" + b"<p>best products, best prices</p>" * 3000 + b"</body>",
+]
+
+
 def _ensure_import_path():
-    repo_root = Path(__file__).resolve().parents[1]
-    src_path = repo_root / "src"
+    src_path = Path(__file__).resolve().parent / "src"
     if str(src_path) not in sys.path:
         sys.path.insert(0, str(src_path))
 
@@ -13,17 +42,21 @@ def _ensure_import_path():
 def run_smoke_test():
     _ensure_import_path()
     from deface_watcher.web import create_app
-    from deface_watcher.services import extractor as extractor_module
+    from deface_watcher import api as api_module
+    from deface_watcher.services.startup import wait_ready
 
     app = create_app()
     client = app.test_client()
 
-    original_extract = extractor_module.extract_text
-    extractor_module.extract_text = lambda url: ("Smoke test content", "Mock", 1, False, None)
+    original_extract = api_module.extract_text
+    api_module.extract_text = lambda url, overload=None: ("Smoke test content", "Mock", 1, False, None, {})
 
     try:
         health = client.get("/health")
         assert health.status_code == 200, health.data
+        wait_ready()
+        ready = client.get("/ready")
+        assert ready.status_code == 200, ready.data
 
         response = client.post("/predict", json={"url": "https://example.com"})
         assert response.status_code == 200, response.data
@@ -31,11 +64,189 @@ def run_smoke_test():
         assert "status" in payload
         assert "probability" in payload
         assert payload.get("checked_url")
+
+        exposition = client.get("/metrics")
+        assert exposition.status_code == 200, exposition.data
+        assert exposition.content_type.startswith("text/plain; version=0.0.4")
+        assert 'deface_scrape_duration_seconds_bucket{source="Mock",le="+Inf"}' in exposition.text
     finally:
-        extractor_module.extract_text = original_extract
+        api_module.extract_text = original_extract
+
+
+def run_tokenizer_parity():
+    _ensure_import_path()
+    import numpy as np
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    from tensorflow.keras.preprocessing.text import Tokenizer
+
+    from deface_watcher.services.tokenizer import VocabTokenizer
+
+    for options in ({"num_words": 12, "oov_token": "<OOV>"}, {"num_words": 12}, {"oov_token": "<OOV>"}, {}):
+        keras_tokenizer = Tokenizer(**options)
+        keras_tokenizer.fit_on_texts(TOKENIZER_CORPUS)
+        tokenizer = VocabTokenizer.from_json(keras_tokenizer.to_json())
+        for max_length in (1, 16, 128):
+            expected = pad_sequences(
+                keras_tokenizer.texts_to_sequences(TOKENIZER_SAMPLES),
+                maxlen=max_length,
+                padding="post",
+                truncating="post",
+            )
+            actual = tokenizer.encode_batch(TOKENIZER_SAMPLES, max_length)
+            assert actual.dtype == np.int32, actual.dtype
+            assert np.array_equal(expected, actual), (options, max_length)
+
+
+def run_html_text_parity():
+    _ensure_import_path()
+    import threading
+
+    from bs4 import BeautifulSoup
+
+    from deface_watcher.services.extractor import _normalize_text
+    from deface_watcher.services.html_text import extract_html_text
+
+    def chunked(data, size):
+        return (data[i : i + size] for i in range(0, len(data), size))
+
+    for html in HTML_SAMPLES:
+        soup = BeautifulSoup(html, "html.parser")
+        for node in soup(["script", "style", "noscript"]):
+            node.decompose()
+        for max_chars in (0, 50, 20000):
+            expected = _normalize_text(soup.get_text(), max_chars or len(html))
+            for size in (1, 13, 4096, len(html)):
+                text, _ = extract_html_text(chunked(html, size), max_chars)
+                actual = _normalize_text(text, max_chars or len(html))
+                assert actual == expected, (html[:60], max_chars, size, actual[:80], expected[0][:80])
+
+    text, received = extract_html_text(chunked(HTML_SAMPLES[-1], 1024), 0, max_bytes=8192)
+    assert received == 8192 and 0 < len(text) < 8192, received
+
+    cancel = threading.Event()
+    cancel.set()
+    text, received = extract_html_text(chunked(HTML_SAMPLES[-1], 1024), 0, cancel=cancel)
+    assert text is None and received == 0
+
+
+def run_process_group_check():
+    _ensure_import_path()
+    import subprocess
+    import time
+
+    from deface_watcher.services import process_group
+
+    if not process_group._POSIX or not os.path.isdir("/proc"):
+        return
+
+    def gone(pid):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            fields = process_group._read_stat(pid)
+            if fields is None or fields[0] in (b"Z", b"X"):
+                return True
+            time.sleep(0.02)
+        return False
+
+    sleeper = "import subprocess, sys, time; " "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+    hung = [sys.executable, "-c", sleeper + "print(child.pid, flush=True); time.sleep(60)"]
+    start = time.monotonic()
+    returncode, stdout, _, error = process_group.run_supervised(hung, timeout=1)
+    assert error == "timeout" and time.monotonic() - start < 5, (error, returncode)
+    assert gone(int(stdout.split()[0])), "child of a timed-out scrape survived"
+
+    orphaning = [sys.executable, "-c", sleeper + "print(child.pid, flush=True)"]
+    start = time.monotonic()
+    returncode, stdout, _, error = process_group.run_supervised(orphaning, timeout=10)
+    assert error is None and returncode == 0 and time.monotonic() - start < 5, (error, returncode)
+    assert gone(int(stdout.split()[0])), "child left behind by an exited scrape survived"
+
+    hog = [sys.executable, "-c", "import time; data = bytearray(256 * 1024 * 1024); time.sleep(60)"]
+    _, _, _, error = process_group.run_supervised(hog, timeout=10, max_rss_mb=64)
+    assert error == "rss_limit", error
+
+    spinner = [sys.executable, "-c", "while True: pass"]
+    _, _, _, error = process_group.run_supervised(spinner, timeout=10, max_cpu_seconds=0.5)
+    assert error == "cpu_limit", error
+
+    leader = subprocess.Popen(orphaning, stdout=subprocess.PIPE, text=True, **process_group.session_kwargs())
+    process_group.register(leader.pid)
+    child_pid = int(leader.stdout.readline())
+    leader.wait()
+    process_group._reap()
+    assert gone(child_pid), "reaper left a straggler running"
+    leader.stdout.close()
+
+
+def run_inference_sidecar_check():
+    _ensure_import_path()
+    import tempfile
+    import threading
+
+    import numpy as np
+
+    from deface_watcher.config import load_settings
+    from deface_watcher.services.artifacts import get_artifacts
+    from deface_watcher.services.inference_server import InferenceClient, InferenceServer
+
+    settings = load_settings()
+    _, tokenizer, infer, version = get_artifacts()
+    processed = tokenizer.encode_batch(TOKENIZER_CORPUS, settings.max_length)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "inference.sock")
+        server = InferenceServer(path, max_batch_size=8, max_wait_ms=1, max_length=settings.max_length)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = InferenceClient(path, timeout=30, retry=1)
+            assert client.ping() and client.version == version, client.stats()
+            output, served_version = client.infer(processed)
+            assert output is not None and output.shape == (len(TOKENIZER_CORPUS), 2), client.stats()
+            assert served_version == version
+            assert np.allclose(output, infer(processed), atol=1e-5)
+            narrow = InferenceClient(path, timeout=30, retry=60)
+            assert narrow.infer(processed[:, :-1]) == (None, None) and not narrow.available, narrow.stats()
+            assert client.ping()
+        finally:
+            server.shutdown()
+            server.server_close()
+        dead = InferenceClient(path, timeout=1, retry=60)
+        assert dead.infer(processed) == (None, None) and not dead.available
+
+
+def run_metrics_aggregation_check():
+    _ensure_import_path()
+    import subprocess
+    import tempfile
+
+    from deface_watcher.services import metrics
+
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    worker = {
+        "counters": [["deface_scrape_errors_total", [["code", "requests_timeout"]], 2]],
+        "gauges": [["deface_scrapes_in_flight", [], 1]],
+        "histograms": [["deface_inference_duration_seconds", [], [1] + [0] * 14, 0.004, 1]],
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = metrics._process_start(os.getpid())
+        metrics._write(os.path.join(tmp_dir, f"{os.getpid()}.json"), {**worker, "started": started})
+        metrics._write(os.path.join(tmp_dir, f"{exited.pid}.json"), worker)
+        # A live pid whose start time differs is a reused pid: the worker that wrote the file is gone.
+        metrics._write(os.path.join(tmp_dir, f"{os.getppid()}.json"), {**worker, "started": -1})
+        for _ in range(2):
+            merged = metrics._collect_shared(tmp_dir)
+            assert merged["counters"][("deface_scrape_errors_total", (("code", "requests_timeout"),))] == 6
+            assert merged["gauges"][("deface_scrapes_in_flight", ())] == 1
+            assert merged["histograms"][("deface_inference_duration_seconds", ())][2] == 3
+        assert sorted(os.listdir(tmp_dir)) == sorted([".lock", "archive.json", f"{os.getpid()}.json"])
 
 
 if __name__ == "__main__":
     os.environ.setdefault("RETURN_TOKENS", "1")
+    run_html_text_parity()
+    run_process_group_check()
+    run_tokenizer_parity()
     run_smoke_test()
+    run_inference_sidecar_check()
+    run_metrics_aggregation_check()
     print("Smoke test passed.")
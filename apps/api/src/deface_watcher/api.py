@@ -1,15 +1,41 @@
+import hmac
 import logging
+import os
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
 from .config import load_settings
-from .services.extractor import extract_text
-from .services.predictor import predict_text
+from .services import metrics
+from .services.admission import ScraperOverloaded
+from .services.artifacts import get_model_stats, reload_artifacts
+from .services.cache import LRUCache, SqliteCache, TieredCache
+from .services.extractor import (
+    extract_text,
+    get_circuit_states,
+    get_scraper_stats,
+    get_stored_prediction,
+    store_prediction,
+)
+from .services.jobs import JobQueue, JobRunner
+from .services.predictor import get_current_version, get_predictor_stats, predict_texts
+from .services.singleflight import SingleFlight
+from .services.startup import get_readiness, get_startup_stats, wait_ready
 
 api_bp = Blueprint("api", __name__)
 
+_RESULT_CACHE_LOCK = Lock()
+_RESULT_CACHE = None
+_FLIGHT_LOCK = Lock()
+_FLIGHT = None
+_JOBS_LOCK = Lock()
+_JOB_QUEUE = None
+_JOB_RUNNER = None
+_JOB_RUNNER_PID = None
+
 
 def _normalize_url(value: str):
     if not value:
@@ -22,11 +48,349 @@ def _normalize_url(value: str):
     return url
 
 
+def _include_tokens(settings, args):
+    return settings.return_tokens or args.get("debug") == "1"
+
+
+def _get_result_cache(settings):
+    global _RESULT_CACHE
+    if settings.result_cache_ttl <= 0:
+        return None
+    if _RESULT_CACHE is not None:
+        return _RESULT_CACHE
+
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            shared = None
+            if settings.result_cache_db:
+                shared = SqliteCache(
+                    settings.result_cache_db,
+                    ttl=settings.result_cache_ttl,
+                    max_entries=settings.result_cache_db_max_entries,
+                    table="results",
+                )
+            _RESULT_CACHE = TieredCache(
+                LRUCache(settings.result_cache_size, ttl=settings.result_cache_ttl),
+                shared=shared,
+            )
+        return _RESULT_CACHE
+
+
+def _cache_bypassed(data, args):
+    return (data.get("cache") or args.get("cache")) == "bypass"
+
+
+def _cached_response(cache, url, request_id, start_time, include_tokens):
+    entry = cache.get(url)
+    if entry is None:
+        metrics.inc("deface_cache_requests_total", cache="result", result="miss")
+        return None
+    cached, stored_at = entry
+    version = get_current_version()
+    # Unknown only while the model is still loading; otherwise a hot swap invalidates every older result.
+    if version is not None and cached.get("model_version") != version:
+        metrics.inc("deface_cache_requests_total", cache="result", result="stale")
+        return None
+    metrics.inc("deface_cache_requests_total", cache="result", result="hit")
+    response = dict(cached)
+    if not include_tokens:
+        response["tokenized_sequence"] = None
+    response["tokenized_sequence_included"] = include_tokens
+    response["request_id"] = request_id
+    response["total_time_ms"] = round((time.time() - start_time) * 1000)
+    response["cache_hit"] = True
+    response["cache_age_ms"] = round((time.time() - stored_at) * 1000)
+    metrics.observe("deface_request_duration_seconds", time.time() - start_time, cache="hit")
+    return response
+
+
+def _store_response(cache, url, response, include_tokens):
+    if cache is not None:
+        cache.set(url, response)
+    if not include_tokens:
+        response = {**response, "tokenized_sequence": None, "tokenized_sequence_included": False}
+    return {**response, "cache_hit": False, "cache_age_ms": None}
+
+
+def get_result_cache_stats():
+    cache = _get_result_cache(load_settings())
+    return cache.stats() if cache is not None else None
+
+
+def _get_flight(settings):
+    global _FLIGHT
+    if not settings.singleflight_enabled:
+        return None
+    if _FLIGHT is not None:
+        return _FLIGHT
+
+    with _FLIGHT_LOCK:
+        if _FLIGHT is None:
+            _FLIGHT = SingleFlight(
+                settings.singleflight_dir or None,
+                wait_timeout=settings.process_timeout + settings.request_timeout + 5,
+            )
+        return _FLIGHT
+
+
+def get_singleflight_stats():
+    flight = _get_flight(load_settings())
+    return flight.stats() if flight is not None else None
+
+
+def _record_extraction(extraction, seconds):
+    _, source, _, _, scrape_error, details = extraction
+    if details.get("revalidated_by") in ("etag", "last_modified"):
+        source = "Revalidated"
+    metrics.observe("deface_scrape_duration_seconds", seconds, source=source)
+    if extraction[0] is None:
+        metrics.inc("deface_scrape_errors_total", code=scrape_error or "unknown")
+    # A routed requests-only scrape or a conditional refetch never tried Puppeteer, so it is not a fallback.
+    routed = (details.get("routing") or {}).get("decision") == "requests"
+    if source == "Requests" and not routed and not details.get("conditional"):
+        metrics.inc("deface_scrape_fallbacks_total", result="ok" if extraction[0] is not None else "failed")
+
+
+def _scrape(url, overload=None):
+    start = time.perf_counter()
+    try:
+        with metrics.in_flight("deface_scrapes_in_flight"):
+            extraction = extract_text(url, overload=overload)
+    except ScraperOverloaded:
+        metrics.inc("deface_scrape_errors_total", code="puppeteer_overloaded")
+        raise
+    _record_extraction(extraction, time.perf_counter() - start)
+    return extraction
+
+
+def _scrape_and_predict(url, overload=None):
+    extraction = _scrape(url, overload)
+    return extraction, _predict_extractions({0: (url, extraction)}).get(0)
+
+
+def _resolve_and_predict(flight, url, overload=None):
+    if flight is None:
+        extraction, prediction = _scrape_and_predict(url, overload)
+        return extraction, prediction, False, 1
+    (extraction, prediction), coalesced, callers = flight.do(url, lambda: _scrape_and_predict(url, overload))
+    return extraction, prediction, coalesced, callers
+
+
+def _resolve_batch_item(flight, url):
+    # The batch predicts every text in one call afterwards, so only the scrape is coalesced, under its own key.
+    try:
+        if flight is None:
+            return _scrape(url), False, 1
+        return flight.do(f"scrape:{url}", lambda: _scrape(url))
+    except ScraperOverloaded as exc:
+        return exc
+
+
+def _predict_extractions(extractions):
+    predictions = {}
+    texts = {}
+    version = None
+    for index, (url, extraction) in extractions.items():
+        text, _, _, _, _, details = extraction
+        if text is None:
+            continue
+        # A 304 means the page is the one already predicted; reuse that result if the model is still the same.
+        not_modified = details.get("revalidated_by") in ("etag", "last_modified")
+        stored = get_stored_prediction(url, text) if not_modified else None
+        if stored is not None:
+            version = version or get_current_version()
+            if stored[4] == version:
+                predictions[index] = tuple(stored)
+                continue
+        texts[index] = (url, text)
+    if texts:
+        for index, prediction in zip(texts, predict_texts([text for _, text in texts.values()])):
+            store_prediction(*texts[index], prediction)
+            predictions[index] = prediction
+    return predictions
+
+
+def _get_job_queue(settings):
+    global _JOB_QUEUE
+    if _JOB_QUEUE is not None:
+        return _JOB_QUEUE
+
+    with _JOBS_LOCK:
+        if _JOB_QUEUE is None:
+            _JOB_QUEUE = JobQueue(
+                settings.jobs_db,
+                lease_seconds=settings.jobs_lease_seconds,
+                max_attempts=settings.jobs_max_attempts,
+                retention=settings.jobs_retention,
+            )
+        return _JOB_QUEUE
+
+
+def _run_job(url):
+    settings = load_settings()
+    request_id = str(uuid.uuid4())
+    start_time = time.time()
+    include_tokens = settings.return_tokens
+    cache = _get_result_cache(settings)
+    if cache is not None:
+        cached = _cached_response(cache, url, request_id, start_time, include_tokens)
+        if cached is not None:
+            return "done", cached
+
+    # Jobs have no client waiting on them, so they always degrade to the fallback instead of shedding.
+    extraction, prediction, coalesced, callers = _resolve_and_predict(_get_flight(settings), url, overload="fallback")
+    flight_fields = {"coalesced": coalesced, "coalesced_callers": callers}
+    if prediction is None:
+        return "failed", {**_scrape_error_response(url, request_id, extraction), **flight_fields}
+
+    response = _prediction_response(url, request_id, extraction, prediction, start_time, True)
+    response = _store_response(None if coalesced else cache, url, response, include_tokens)
+    return "done", {**response, **flight_fields}
+
+
+def start_job_workers():
+    global _JOB_RUNNER, _JOB_RUNNER_PID
+    settings = load_settings()
+    if settings.jobs_workers <= 0:
+        return None
+    if _JOB_RUNNER is not None and _JOB_RUNNER_PID == os.getpid():
+        return _JOB_RUNNER
+
+    queue = _get_job_queue(settings)
+    with _JOBS_LOCK:
+        if _JOB_RUNNER is None or _JOB_RUNNER_PID != os.getpid():
+            _JOB_RUNNER = JobRunner(
+                queue,
+                _run_job,
+                workers=settings.jobs_workers,
+                poll=settings.jobs_poll_ms / 1000,
+            ).start()
+            _JOB_RUNNER_PID = os.getpid()
+        return _JOB_RUNNER
+
+
+def get_job_stats():
+    runner = _JOB_RUNNER if _JOB_RUNNER_PID == os.getpid() else None
+    if runner is not None:
+        return runner.stats()
+    settings = load_settings()
+    if _JOB_QUEUE is None and not os.path.exists(settings.jobs_db):
+        return {"workers": 0, "queue": None}
+    return {"workers": 0, "queue": _get_job_queue(settings).counts()}
+
+
+def collect_stats():
+    return {
+        "model": get_model_stats(),
+        "predictor": get_predictor_stats(),
+        "scraper": get_scraper_stats(),
+        "result_cache": get_result_cache_stats(),
+        "singleflight": get_singleflight_stats(),
+        "jobs": get_job_stats(),
+        "startup": get_startup_stats(),
+    }
+
+
+def _not_ready_response(request_id):
+    return {
+        "error": "Model đang được nạp, vui lòng thử lại sau.",
+        "request_id": request_id,
+        "loading": get_readiness(),
+    }
+
+
+def _scrape_error_response(url, request_id, extraction):
+    _, source, scrape_time_ms, _, scrape_error, details = extraction
+    return {
+        "error": "Không thể cào dữ liệu từ URL này (bị chặn/timeout/lỗi).",
+        "request_id": request_id,
+        "checked_url": url,
+        "source": source,
+        "scrape_time_ms": scrape_time_ms,
+        "scrape_error": scrape_error,
+        **details,
+    }
+
+
+def _overloaded_response(url, request_id, exc):
+    return {
+        "error": "Hệ thống đang quá tải, vui lòng thử lại sau.",
+        "request_id": request_id,
+        "checked_url": url,
+        "scrape_error": "puppeteer_overloaded",
+        "retry_after": exc.retry_after,
+    }
+
+
+def _prediction_response(url, request_id, extraction, prediction, start_time, include_tokens):
+    text, source, scrape_time_ms, truncated, _, details = extraction
+    status, probability, tokenized_sequence, predict_time_ms, model_version = prediction
+    total_time_ms = round((time.time() - start_time) * 1000)
+    metrics.observe("deface_request_duration_seconds", time.time() - start_time, cache="miss")
+
+    text_response = text if text else "(Không tìm thấy văn bản)"
+    return {
+        "status": status,
+        "probability": float(probability),
+        "extracted_text": text_response,
+        "extracted_text_truncated": truncated,
+        "tokenized_sequence": tokenized_sequence if include_tokens else None,
+        "tokenized_sequence_included": include_tokens,
+        "checked_url": url,
+        "source": source,
+        "scrape_time_ms": scrape_time_ms,
+        "predict_time_ms": predict_time_ms,
+        "total_time_ms": total_time_ms,
+        "model_version": model_version,
+        "request_id": request_id,
+        **details,
+    }
+
+
 @api_bp.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok"})
 
 
+@api_bp.route("/ready", methods=["GET"])
+def ready():
+    readiness = get_readiness()
+    return jsonify(readiness), 200 if readiness["ready"] else 503
+
+
+@api_bp.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(collect_stats())
+
+
+@api_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not load_settings().metrics_enabled:
+        return jsonify({"error": "Không tìm thấy."}), 404
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_bp.route("/stats/circuits", methods=["GET"])
+def circuit_states():
+    circuits = get_circuit_states()
+    if request.args.get("all") != "1":
+        circuits = [circuit for circuit in circuits if circuit["state"] != "closed"]
+    return jsonify({"circuits": circuits, "count": len(circuits)})
+
+
+@api_bp.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    settings = load_settings()
+    if not settings.admin_token:
+        return jsonify({"error": "Không tìm thấy."}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), settings.admin_token):
+        return jsonify({"error": "Không có quyền."}), 403
+
+    wait = request.args.get("wait") == "1"
+    started = reload_artifacts(force=request.args.get("force") == "1", wait=wait)
+    return jsonify({"started": started, "pid": os.getpid(), "model": get_model_stats()}), 200 if wait else 202
+
+
 @api_bp.route("/predict", methods=["POST"])
 def predict():
     settings = load_settings()
@@ -39,43 +403,180 @@ def predict():
     if not url:
         return jsonify({"error": "Dữ liệu JSON không hợp lệ hoặc thiếu URL.", "request_id": request_id}), 400
 
+    include_tokens = _include_tokens(settings, request.args)
+    cache = _get_result_cache(settings)
     try:
-        text, source, scrape_time_ms, truncated, scrape_error = extract_text(url)
-        if text is None:
+        if cache is not None and not _cache_bypassed(data, request.args):
+            cached = _cached_response(cache, url, request_id, start_time, include_tokens)
+            if cached is not None:
+                return jsonify(cached)
+        if not wait_ready(settings.ready_wait_ms / 1000):
+            return jsonify(_not_ready_response(request_id)), 503, {"Retry-After": str(settings.ready_retry_after)}
+
+        extraction, prediction, coalesced, callers = _resolve_and_predict(_get_flight(settings), url)
+        flight_fields = {"coalesced": coalesced, "coalesced_callers": callers}
+        if prediction is None:
+            return jsonify({**_scrape_error_response(url, request_id, extraction), **flight_fields}), 400
+
+        response = _prediction_response(url, request_id, extraction, prediction, start_time, True)
+        response = _store_response(None if coalesced else cache, url, response, include_tokens)
+        return jsonify({**response, **flight_fields})
+    except ScraperOverloaded as exc:
+        return jsonify(_overloaded_response(url, request_id, exc)), 503, {"Retry-After": str(exc.retry_after)}
+    except Exception:
+        logger.exception("Unhandled error in /predict request_id=%s", request_id)
+        return jsonify({"error": "Lỗi máy chủ không mong muốn.", "request_id": request_id}), 500
+
+
+@api_bp.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    batch_request_id = str(uuid.uuid4())
+
+    start_time = time.time()
+    data = request.get_json(silent=True) or {}
+    raw_urls = data.get("urls")
+    if not isinstance(raw_urls, list) or not raw_urls:
+        return (
+            jsonify({"error": "Dữ liệu JSON không hợp lệ hoặc thiếu danh sách URL.", "request_id": batch_request_id}),
+            400,
+        )
+    if len(raw_urls) > settings.batch_max_urls:
+        return (
+            jsonify(
+                {
+                    "error": f"Tối đa {settings.batch_max_urls} URL cho mỗi yêu cầu.",
+                    "request_id": batch_request_id,
+                }
+            ),
+            400,
+        )
+
+    urls = [_normalize_url(value) if isinstance(value, str) else None for value in raw_urls]
+    request_ids = [str(uuid.uuid4()) for _ in urls]
+    include_tokens = _include_tokens(settings, request.args)
+    cache = _get_result_cache(settings)
+
+    try:
+        cached = {}
+        if cache is not None and not _cache_bypassed(data, request.args):
+            for index, url in enumerate(urls):
+                if url:
+                    response = _cached_response(cache, url, request_ids[index], start_time, include_tokens)
+                    if response is not None:
+                        cached[index] = response
+
+        valid = [index for index, url in enumerate(urls) if url and index not in cached]
+        if valid and not wait_ready(settings.ready_wait_ms / 1000):
             return (
-                jsonify(
+                jsonify(_not_ready_response(batch_request_id)),
+                503,
+                {"Retry-After": str(settings.ready_retry_after)},
+            )
+        resolved = {}
+        if valid:
+            flight = _get_flight(settings)
+            max_workers = max(1, min(settings.batch_max_workers, len(valid)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = executor.map(lambda url: _resolve_batch_item(flight, url), [urls[i] for i in valid])
+                resolved = dict(zip(valid, outcomes))
+        # One tokenizer pass and one padded tensor for every scraped text in the batch.
+        predictions = _predict_extractions(
+            {
+                index: (urls[index], outcome[0])
+                for index, outcome in resolved.items()
+                if not isinstance(outcome, ScraperOverloaded)
+            }
+        )
+
+        results = []
+        for index, url in enumerate(urls):
+            request_id = request_ids[index]
+            if not url:
+                results.append(
                     {
-                        "error": "Không thể cào dữ liệu từ URL này (bị chặn/timeout/lỗi).",
+                        "error": "URL không hợp lệ.",
                         "request_id": request_id,
-                        "checked_url": url,
-                        "source": source,
-                        "scrape_time_ms": scrape_time_ms,
-                        "scrape_error": scrape_error,
+                        "input": raw_urls[index],
                     }
-                ),
-                400,
-            )
+                )
+                continue
+            if index in cached:
+                results.append(cached[index])
+                continue
+            if isinstance(resolved[index], ScraperOverloaded):
+                results.append(_overloaded_response(url, request_id, resolved[index]))
+                continue
+            extraction, coalesced, callers = resolved[index]
+            flight_fields = {"coalesced": coalesced, "coalesced_callers": callers}
+            if index not in predictions:
+                results.append({**_scrape_error_response(url, request_id, extraction), **flight_fields})
+                continue
+            response = _prediction_response(url, request_id, extraction, predictions[index], start_time, True)
+            response = _store_response(None if coalesced else cache, url, response, include_tokens)
+            results.append({**response, **flight_fields})
 
-        status, probability, tokenized_sequence, predict_time_ms = predict_text(text)
-        total_time_ms = round((time.time() - start_time) * 1000)
-
-        include_tokens = settings.return_tokens or request.args.get("debug") == "1"
-        text_response = text if text else "(Không tìm thấy văn bản)"
-        response = {
-            "status": status,
-            "probability": float(probability),
-            "extracted_text": text_response,
-            "extracted_text_truncated": truncated,
-            "tokenized_sequence": tokenized_sequence if include_tokens else None,
-            "tokenized_sequence_included": include_tokens,
-            "checked_url": url,
-            "source": source,
-            "scrape_time_ms": scrape_time_ms,
-            "predict_time_ms": predict_time_ms,
-            "total_time_ms": total_time_ms,
-            "request_id": request_id,
-        }
-        return jsonify(response)
+        return jsonify(
+            {
+                "results": results,
+                "count": len(results),
+                "total_time_ms": round((time.time() - start_time) * 1000),
+                "request_id": batch_request_id,
+            }
+        )
     except Exception:
-        logger.exception("Unhandled error in /predict request_id=%s", request_id)
+        logger.exception("Unhandled error in /predict/batch request_id=%s", batch_request_id)
+        return jsonify({"error": "Lỗi máy chủ không mong muốn.", "request_id": batch_request_id}), 500
+
+
+@api_bp.route("/jobs", methods=["POST"])
+def create_jobs():
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    request_id = str(uuid.uuid4())
+
+    data = request.get_json(silent=True) or {}
+    raw_urls = data.get("urls") if "urls" in data else [data.get("url")]
+    if not isinstance(raw_urls, list) or not raw_urls or raw_urls == [None]:
+        return jsonify({"error": "Dữ liệu JSON không hợp lệ hoặc thiếu URL.", "request_id": request_id}), 400
+    if len(raw_urls) > settings.batch_max_urls:
+        return (
+            jsonify({"error": f"Tối đa {settings.batch_max_urls} URL cho mỗi yêu cầu.", "request_id": request_id}),
+            400,
+        )
+
+    urls = [_normalize_url(value) if isinstance(value, str) else None for value in raw_urls]
+    try:
+        start_job_workers()
+        job_ids = iter(_get_job_queue(settings).enqueue([url for url in urls if url]))
+    except Exception:
+        logger.exception("Unhandled error in /jobs request_id=%s", request_id)
         return jsonify({"error": "Lỗi máy chủ không mong muốn.", "request_id": request_id}), 500
+
+    jobs = []
+    for index, url in enumerate(urls):
+        if not url:
+            jobs.append({"error": "URL không hợp lệ.", "input": raw_urls[index]})
+            continue
+        job_id = next(job_ids)
+        jobs.append({"job_id": job_id, "url": url, "status": "queued", "status_url": f"/jobs/{job_id}"})
+    return jsonify({"jobs": jobs, "count": len(jobs), "request_id": request_id}), 202
+
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    settings = load_settings()
+    queue = _get_job_queue(settings)
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0.0), settings.jobs_max_wait)
+    except ValueError:
+        wait = 0.0
+
+    if wait > 0:
+        job = queue.wait(job_id, wait, settings.jobs_poll_ms / 1000)
+    else:
+        job = queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Không tìm thấy job.", "job_id": job_id}), 404
+    return jsonify(job)
@@ -0,0 +1,339 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+
+from .api import (
+    _cache_bypassed,
+    _cached_response,
+    _get_result_cache,
+    _include_tokens,
+    _normalize_url,
+    _not_ready_response,
+    _overloaded_response,
+    _predict_extractions,
+    _prediction_response,
+    _record_extraction,
+    _scrape_error_response,
+    _store_response,
+    collect_stats,
+    start_job_workers,
+)
+from .config import load_settings
+from .services import metrics
+from .services.admission import ScraperOverloaded
+from .services.async_extractor import close_client, extract_text_async, run_blocking
+from .services.singleflight import AsyncSingleFlight
+from .services.startup import wait_ready
+from .web import create_app, init_worker
+
+_READY_POLL_SECONDS = 0.05
+
+_EXECUTOR_LOCK = Lock()
+_INFERENCE_EXECUTOR = None
+_FLIGHT = None
+
+
+def _get_inference_executor(settings):
+    global _INFERENCE_EXECUTOR
+    if _INFERENCE_EXECUTOR is not None:
+        return _INFERENCE_EXECUTOR
+
+    with _EXECUTOR_LOCK:
+        if _INFERENCE_EXECUTOR is None:
+            _INFERENCE_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, settings.inference_workers),
+                thread_name_prefix="inference",
+            )
+        return _INFERENCE_EXECUTOR
+
+
+def _get_flight(settings):
+    global _FLIGHT
+    if not settings.singleflight_enabled:
+        return None
+    if _FLIGHT is None:
+        _FLIGHT = AsyncSingleFlight(
+            settings.singleflight_dir or None,
+            wait_timeout=settings.process_timeout + settings.request_timeout + 5,
+        )
+    return _FLIGHT
+
+
+def _reset_after_fork():
+    global _INFERENCE_EXECUTOR, _FLIGHT
+    _INFERENCE_EXECUTOR = None
+    _FLIGHT = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def _read_json(scope, receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    headers = dict(scope.get("headers") or [])
+    if b"json" not in headers.get(b"content-type", b""):
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _query_args(scope):
+    return dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+
+
+async def _send_json(send, status: int, payload, headers=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                *((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _scrape(url):
+    start = time.perf_counter()
+    try:
+        with metrics.in_flight("deface_scrapes_in_flight"):
+            extraction = await extract_text_async(url)
+    except ScraperOverloaded:
+        metrics.inc("deface_scrape_errors_total", code="puppeteer_overloaded")
+        raise
+    _record_extraction(extraction, time.perf_counter() - start)
+    return extraction
+
+
+async def _run_inference(settings, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_inference_executor(settings), fn, *args)
+
+
+async def _wait_ready(settings):
+    deadline = time.monotonic() + settings.ready_wait_ms / 1000
+    while not wait_ready(0):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(_READY_POLL_SECONDS)
+    return True
+
+
+async def _scrape_and_predict(settings, url):
+    extraction = await _scrape(url)
+    predictions = await _run_inference(settings, _predict_extractions, {0: (url, extraction)})
+    return extraction, predictions.get(0)
+
+
+async def _resolve_and_predict(settings, url):
+    flight = _get_flight(settings)
+    if flight is None:
+        extraction, prediction = await _scrape_and_predict(settings, url)
+        return extraction, prediction, False, 1
+    (extraction, prediction), coalesced, callers = await flight.do(url, lambda: _scrape_and_predict(settings, url))
+    return extraction, prediction, coalesced, callers
+
+
+async def _resolve_batch_item(settings, url):
+    flight = _get_flight(settings)
+    if flight is None:
+        return await _scrape(url), False, 1
+    return await flight.do(f"scrape:{url}", lambda: _scrape(url))
+
+
+async def _predict(scope, receive, send):
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    request_id = str(uuid.uuid4())
+
+    start_time = time.time()
+    data = await _read_json(scope, receive)
+    args = _query_args(scope)
+    url = _normalize_url(data.get("url"))
+    if not url:
+        payload = {"error": "Dữ liệu JSON không hợp lệ hoặc thiếu URL.", "request_id": request_id}
+        return await _send_json(send, 400, payload)
+
+    include_tokens = _include_tokens(settings, args)
+    cache = _get_result_cache(settings)
+    try:
+        if cache is not None and not _cache_bypassed(data, args):
+            cached = await run_blocking(settings, _cached_response, cache, url, request_id, start_time, include_tokens)
+            if cached is not None:
+                return await _send_json(send, 200, cached)
+        if not await _wait_ready(settings):
+            headers = {"Retry-After": str(settings.ready_retry_after)}
+            return await _send_json(send, 503, _not_ready_response(request_id), headers)
+
+        extraction, prediction, coalesced, callers = await _resolve_and_predict(settings, url)
+        flight_fields = {"coalesced": coalesced, "coalesced_callers": callers}
+        if prediction is None:
+            payload = {**_scrape_error_response(url, request_id, extraction), **flight_fields}
+            return await _send_json(send, 400, payload)
+
+        response = _prediction_response(url, request_id, extraction, prediction, start_time, True)
+        response = await run_blocking(
+            settings, _store_response, None if coalesced else cache, url, response, include_tokens
+        )
+        return await _send_json(send, 200, {**response, **flight_fields})
+    except ScraperOverloaded as exc:
+        headers = {"Retry-After": str(exc.retry_after)}
+        return await _send_json(send, 503, _overloaded_response(url, request_id, exc), headers)
+    except Exception:
+        logger.exception("Unhandled error in /predict request_id=%s", request_id)
+        return await _send_json(send, 500, {"error": "Lỗi máy chủ không mong muốn.", "request_id": request_id})
+
+
+async def _predict_batch(scope, receive, send):
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    batch_request_id = str(uuid.uuid4())
+
+    start_time = time.time()
+    data = await _read_json(scope, receive)
+    args = _query_args(scope)
+    raw_urls = data.get("urls")
+    if not isinstance(raw_urls, list) or not raw_urls:
+        payload = {"error": "Dữ liệu JSON không hợp lệ hoặc thiếu danh sách URL.", "request_id": batch_request_id}
+        return await _send_json(send, 400, payload)
+    if len(raw_urls) > settings.batch_max_urls:
+        payload = {"error": f"Tối đa {settings.batch_max_urls} URL cho mỗi yêu cầu.", "request_id": batch_request_id}
+        return await _send_json(send, 400, payload)
+
+    urls = [_normalize_url(value) if isinstance(value, str) else None for value in raw_urls]
+    request_ids = [str(uuid.uuid4()) for _ in urls]
+    include_tokens = _include_tokens(settings, args)
+    cache = _get_result_cache(settings)
+
+    try:
+        cached = {}
+        if cache is not None and not _cache_bypassed(data, args):
+            for index, url in enumerate(urls):
+                if url:
+                    response = await run_blocking(
+                        settings, _cached_response, cache, url, request_ids[index], start_time, include_tokens
+                    )
+                    if response is not None:
+                        cached[index] = response
+
+        valid = [index for index, url in enumerate(urls) if url and index not in cached]
+        if valid and not await _wait_ready(settings):
+            headers = {"Retry-After": str(settings.ready_retry_after)}
+            return await _send_json(send, 503, _not_ready_response(batch_request_id), headers)
+        limit = asyncio.Semaphore(max(1, settings.batch_max_workers))
+
+        async def resolve(url):
+            async with limit:
+                try:
+                    return await _resolve_batch_item(settings, url)
+                except ScraperOverloaded as exc:
+                    return exc
+
+        resolved = dict(zip(valid, await asyncio.gather(*(resolve(urls[index]) for index in valid))))
+        extractions = {
+            index: (urls[index], outcome[0])
+            for index, outcome in resolved.items()
+            if not isinstance(outcome, ScraperOverloaded)
+        }
+        predictions = await _run_inference(settings, _predict_extractions, extractions) if extractions else {}
+
+        results = []
+        for index, url in enumerate(urls):
+            request_id = request_ids[index]
+            if not url:
+                results.append({"error": "URL không hợp lệ.", "request_id": request_id, "input": raw_urls[index]})
+                continue
+            if index in cached:
+                results.append(cached[index])
+                continue
+            if isinstance(resolved[index], ScraperOverloaded):
+                results.append(_overloaded_response(url, request_id, resolved[index]))
+                continue
+            extraction, coalesced, callers = resolved[index]
+            flight_fields = {"coalesced": coalesced, "coalesced_callers": callers}
+            if index not in predictions:
+                results.append({**_scrape_error_response(url, request_id, extraction), **flight_fields})
+                continue
+            response = _prediction_response(url, request_id, extraction, predictions[index], start_time, True)
+            response = await run_blocking(
+                settings, _store_response, None if coalesced else cache, url, response, include_tokens
+            )
+            results.append({**response, **flight_fields})
+
+        payload = {
+            "results": results,
+            "count": len(results),
+            "total_time_ms": round((time.time() - start_time) * 1000),
+            "request_id": batch_request_id,
+        }
+        return await _send_json(send, 200, payload)
+    except Exception:
+        logger.exception("Unhandled error in /predict/batch request_id=%s", batch_request_id)
+        payload = {"error": "Lỗi máy chủ không mong muốn.", "request_id": batch_request_id}
+        return await _send_json(send, 500, payload)
+
+
+async def _stats(scope, receive, send):
+    stats = collect_stats()
+    flight = _get_flight(load_settings())
+    stats["singleflight"] = flight.stats() if flight is not None else None
+    return await _send_json(send, 200, stats)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if load_settings().preload_artifacts:
+                init_worker()
+            start_job_workers()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_client()
+            if _INFERENCE_EXECUTOR is not None:
+                _INFERENCE_EXECUTOR.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+_ROUTES = {
+    ("POST", "/predict"): _predict,
+    ("POST", "/predict/batch"): _predict_batch,
+    ("GET", "/stats"): _stats,
+}
+
+
+def create_asgi_app():
+    flask_app = WsgiToAsgi(create_app())
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await _lifespan(receive, send)
+        if scope["type"] == "http":
+            handler = _ROUTES.get((scope["method"], scope["path"]))
+            if handler is not None:
+                return await handler(scope, receive, send)
+        return await flask_app(scope, receive, send)
+
+    return app
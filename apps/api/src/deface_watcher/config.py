@@ -19,16 +19,94 @@ def _get_bool_env(name: str, default: bool = False) -> bool:
 class Settings:
     root_dir: Path
     model_path: Path
+    numpy_weights_path: Path
+    inference_engine: str
     tokenizer_path: Path
+    vocab_path: Path
     scraper_js_path: Path
+    scraper_mode: str
+    scraper_daemon_js_path: Path
+    scraper_pool_size: int
+    scraper_max_pages_per_browser: int
+    scraper_page_timeout_ms: int
+    scraper_max_concurrent: int
+    scraper_max_queue: int
+    scraper_queue_timeout_ms: int
+    scraper_overload: str
+    scraper_retry_after: int
+    scraper_slots_dir: str
+    scraper_max_rss_mb: float
+    scraper_max_cpu_seconds: float
+    scraper_reaper_interval: float
+    circuit_failure_threshold: int
+    circuit_cooldown: float
+    circuit_max_cooldown: float
+    circuit_max_hosts: int
+    router_min_samples: int
+    router_min_similarity: float
+    router_reprobe_every: int
+    router_reprobe_interval: float
+    router_max_hosts: int
     max_length: int
     process_timeout: int
     request_timeout: int
+    hedge_enabled: bool
+    hedge_delay_ms: int
+    hedge_grace_ms: int
+    hedge_min_chars: int
+    hedge_max_workers: int
+    http_pool_hosts: int
+    http_pool_maxsize: int
+    dns_cache_ttl: float
+    fallback_max_bytes: int
+    async_max_connections: int
+    async_blocking_workers: int
+    inference_workers: int
+    preload_artifacts: bool
+    warmup_batch_sizes: tuple
+    load_on_boot: bool
+    ready_wait_ms: float
+    ready_retry_after: int
+    model_watch_interval: float
+    admin_token: str
+    inference_socket: str
+    inference_socket_timeout_ms: float
+    inference_sidecar_retry: float
+    inference_sidecar_wait: float
+    inference_sidecar_spawn: bool
+    metrics_enabled: bool
+    metrics_dir: str
+    metrics_flush_interval: float
+    revalidate_max_age: float
+    revalidate_cache_size: int
+    revalidate_db: str
+    revalidate_db_max_entries: int
     max_chars: int
     strict_empty_text: bool
     return_tokens: bool
     log_level: str
     request_headers: dict
+    result_cache_ttl: float
+    result_cache_size: int
+    result_cache_db: str
+    result_cache_db_max_entries: int
+    predict_memo_size: int
+    predict_memo_db: str
+    predict_memo_db_max_entries: int
+    singleflight_enabled: bool
+    singleflight_dir: str
+    jobs_db: str
+    jobs_workers: int
+    jobs_lease_seconds: float
+    jobs_max_attempts: int
+    jobs_max_wait: float
+    jobs_poll_ms: float
+    jobs_retention: float
+    batch_max_urls: int
+    batch_max_workers: int
+    microbatch_enabled: bool
+    microbatch_max_size: int
+    microbatch_max_wait_ms: float
 
 
 _SETTINGS = None
@@ -44,17 +122,84 @@ def load_settings() -> Settings:
     scraper_dir = root_dir / "tools" / "scraper"
 
     model_path = Path(os.getenv("MODEL_PATH", artifacts_dir / "bilstm_defacement_model.keras"))
+    numpy_weights_path = Path(os.getenv("NUMPY_WEIGHTS_PATH", artifacts_dir / "bilstm_weights.npz"))
     tokenizer_path = Path(os.getenv("TOKENIZER_PATH", artifacts_dir / "tokenizer.json"))
+    vocab_path = Path(os.getenv("VOCAB_PATH", artifacts_dir / "tokenizer_vocab.bin"))
     scraper_js_path = Path(os.getenv("SCRAPER_JS_PATH", scraper_dir / "get_text_puppeteer.js"))
+    scraper_daemon_js_path = Path(os.getenv("SCRAPER_DAEMON_JS_PATH", scraper_dir / "scraper_daemon.js"))
+    scraper_max_concurrent = int(os.getenv("SCRAPER_MAX_CONCURRENT", "4"))
+    scraper_max_queue = int(os.getenv("SCRAPER_MAX_QUEUE", "16"))
+    # Every admitted or queued hedge holds a Puppeteer thread and a requests thread.
+    hedge_workers_default = 2 * (scraper_max_concurrent + scraper_max_queue) if scraper_max_concurrent > 0 else 64
+    predict_memo_db = os.getenv("PREDICT_MEMO_DB", "").strip() or str(root_dir / "var" / "predict_memo.sqlite3")
 
     _SETTINGS = Settings(
         root_dir=root_dir,
         model_path=model_path,
+        numpy_weights_path=numpy_weights_path,
+        inference_engine=os.getenv("INFERENCE_ENGINE", "keras").strip().lower(),
         tokenizer_path=tokenizer_path,
+        vocab_path=vocab_path,
         scraper_js_path=scraper_js_path,
+        scraper_mode=os.getenv("SCRAPER_MODE", "process").strip().lower(),
+        scraper_daemon_js_path=scraper_daemon_js_path,
+        scraper_pool_size=int(os.getenv("SCRAPER_POOL_SIZE", "2")),
+        scraper_max_pages_per_browser=int(os.getenv("SCRAPER_MAX_PAGES_PER_BROWSER", "50")),
+        scraper_page_timeout_ms=int(os.getenv("SCRAPER_PAGE_TIMEOUT_MS", "12000")),
+        scraper_max_concurrent=scraper_max_concurrent,
+        scraper_max_queue=scraper_max_queue,
+        scraper_queue_timeout_ms=int(os.getenv("SCRAPER_QUEUE_TIMEOUT_MS", "5000")),
+        scraper_overload=os.getenv("SCRAPER_OVERLOAD", "fallback").strip().lower(),
+        scraper_retry_after=int(os.getenv("SCRAPER_RETRY_AFTER", "5")),
+        scraper_slots_dir=os.getenv("SCRAPER_SLOTS_DIR", "").strip(),
+        scraper_max_rss_mb=float(os.getenv("SCRAPER_MAX_RSS_MB", "0")),
+        scraper_max_cpu_seconds=float(os.getenv("SCRAPER_MAX_CPU_SECONDS", "0")),
+        scraper_reaper_interval=float(os.getenv("SCRAPER_REAPER_INTERVAL", "30")),
+        circuit_failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3")),
+        circuit_cooldown=float(os.getenv("CIRCUIT_COOLDOWN", "60")),
+        circuit_max_cooldown=float(os.getenv("CIRCUIT_MAX_COOLDOWN", "900")),
+        circuit_max_hosts=int(os.getenv("CIRCUIT_MAX_HOSTS", "10000")),
+        router_min_samples=int(os.getenv("ROUTER_MIN_SAMPLES", "0")),
+        router_min_similarity=float(os.getenv("ROUTER_MIN_SIMILARITY", "0.8")),
+        router_reprobe_every=int(os.getenv("ROUTER_REPROBE_EVERY", "20")),
+        router_reprobe_interval=float(os.getenv("ROUTER_REPROBE_INTERVAL", "3600")),
+        router_max_hosts=int(os.getenv("ROUTER_MAX_HOSTS", "10000")),
         max_length=128,
         process_timeout=int(os.getenv("PROCESS_TIMEOUT", "15")),
         request_timeout=int(os.getenv("REQUEST_TIMEOUT", "6")),
+        hedge_enabled=_get_bool_env("HEDGE", False),
+        hedge_delay_ms=int(os.getenv("HEDGE_DELAY_MS", "0")),
+        hedge_grace_ms=int(os.getenv("HEDGE_GRACE_MS", "300")),
+        hedge_min_chars=int(os.getenv("HEDGE_MIN_CHARS", "20")),
+        hedge_max_workers=int(os.getenv("HEDGE_MAX_WORKERS", "0")) or hedge_workers_default,
+        http_pool_hosts=int(os.getenv("HTTP_POOL_HOSTS", "64")),
+        http_pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "32")),
+        dns_cache_ttl=float(os.getenv("DNS_CACHE_TTL", "300")),
+        fallback_max_bytes=int(os.getenv("FALLBACK_MAX_BYTES", "2000000")),
+        async_max_connections=int(os.getenv("ASYNC_MAX_CONNECTIONS", "1000")),
+        async_blocking_workers=int(os.getenv("ASYNC_BLOCKING_WORKERS", "8")),
+        inference_workers=int(os.getenv("INFERENCE_WORKERS", "4")),
+        preload_artifacts=_get_bool_env("PRELOAD_ARTIFACTS", False),
+        warmup_batch_sizes=tuple(
+            int(size) for size in os.getenv("WARMUP_BATCH_SIZES", "1,8,32").split(",") if size.strip()
+        ),
+        load_on_boot=_get_bool_env("LOAD_ON_BOOT", True),
+        ready_wait_ms=float(os.getenv("READY_WAIT_MS", "5000")),
+        ready_retry_after=int(os.getenv("READY_RETRY_AFTER", "5")),
+        model_watch_interval=float(os.getenv("MODEL_WATCH_INTERVAL", "10")),
+        admin_token=os.getenv("ADMIN_TOKEN", "").strip(),
+        inference_socket=os.getenv("INFERENCE_SOCKET", "").strip(),
+        inference_socket_timeout_ms=float(os.getenv("INFERENCE_SOCKET_TIMEOUT_MS", "2000")),
+        inference_sidecar_retry=float(os.getenv("INFERENCE_SIDECAR_RETRY", "5")),
+        inference_sidecar_wait=float(os.getenv("INFERENCE_SIDECAR_WAIT", "60")),
+        inference_sidecar_spawn=_get_bool_env("INFERENCE_SIDECAR_SPAWN", True),
+        metrics_enabled=_get_bool_env("METRICS", True),
+        metrics_dir=os.getenv("METRICS_DIR", "").strip() or str(root_dir / "var" / "metrics"),
+        metrics_flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "5")),
+        revalidate_max_age=float(os.getenv("REVALIDATE_MAX_AGE", "86400")),
+        revalidate_cache_size=int(os.getenv("REVALIDATE_CACHE_SIZE", "1024")),
+        revalidate_db=os.getenv("REVALIDATE_DB", "").strip(),
+        revalidate_db_max_entries=int(os.getenv("REVALIDATE_DB_MAX_ENTRIES", "100000")),
         max_chars=int(os.getenv("MAX_CHARS", "20000")),
         strict_empty_text=_get_bool_env("STRICT_EMPTY_TEXT", False),
         return_tokens=_get_bool_env("RETURN_TOKENS", False),
@@ -67,6 +212,27 @@ def load_settings() -> Settings:
                 "Chrome/91.0.4472.124 Safari/537.36",
             )
         },
+        result_cache_ttl=float(os.getenv("RESULT_CACHE_TTL", "60")),
+        result_cache_size=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+        result_cache_db=os.getenv("RESULT_CACHE_DB", "").strip(),
+        result_cache_db_max_entries=int(os.getenv("RESULT_CACHE_DB_MAX_ENTRIES", "100000")),
+        predict_memo_size=int(os.getenv("PREDICT_MEMO_SIZE", "4096")),
+        predict_memo_db="" if predict_memo_db == "0" else predict_memo_db,
+        predict_memo_db_max_entries=int(os.getenv("PREDICT_MEMO_DB_MAX_ENTRIES", "200000")),
+        singleflight_enabled=_get_bool_env("SINGLEFLIGHT", True),
+        singleflight_dir=os.getenv("SINGLEFLIGHT_DIR", "").strip(),
+        jobs_db=os.getenv("JOBS_DB", "").strip() or str(root_dir / "var" / "jobs.sqlite3"),
+        jobs_workers=int(os.getenv("JOBS_WORKERS", "2")),
+        jobs_lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", "120")),
+        jobs_max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+        jobs_max_wait=float(os.getenv("JOBS_MAX_WAIT", "60")),
+        jobs_poll_ms=float(os.getenv("JOBS_POLL_MS", "500")),
+        jobs_retention=float(os.getenv("JOBS_RETENTION", "86400")),
+        batch_max_urls=int(os.getenv("BATCH_MAX_URLS", "200")),
+        batch_max_workers=int(os.getenv("BATCH_MAX_WORKERS", "8")),
+        microbatch_enabled=_get_bool_env("MICROBATCH", True),
+        microbatch_max_size=int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+        microbatch_max_wait_ms=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5")),
     )
     return _SETTINGS
 
@@ -1 +1 @@
-__all__ = ["artifacts", "extractor", "preprocess", "predictor"]
+__all__ = ["artifacts", "extractor", "preprocess", "predictor", "tokenizer"]
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_POLL_SECONDS = 0.02
+
+
+class ScraperOverloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("scraper_overloaded")
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, directory=None):
+        self._max_concurrent = max(1, int(max_concurrent))
+        self._max_queue = max(0, int(max_queue))
+        self._queue_timeout = float(queue_timeout)
+        self._directory = str(directory) if directory and fcntl is not None else None
+        self._condition = threading.Condition()
+        self._async_waiters = deque()
+        self._active = 0
+        self._waiting = 0
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "degraded": 0,
+            "shed": 0,
+            "max_waiting": 0,
+        }
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+
+    def acquire(self, cancel=None):
+        deadline = time.monotonic() + self._queue_timeout
+        with self._condition:
+            if self._active >= self._max_concurrent:
+                if self._waiting >= self._max_queue:
+                    self._stats["rejected_queue_full"] += 1
+                    return None
+                self._waiting += 1
+                self._stats["queued"] += 1
+                self._stats["max_waiting"] = max(self._stats["max_waiting"], self._waiting)
+                try:
+                    while self._active >= self._max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if cancel is not None and cancel.is_set():
+                            return None
+                        if remaining <= 0:
+                            self._stats["rejected_timeout"] += 1
+                            return None
+                        self._condition.wait(remaining if cancel is None else min(remaining, _POLL_SECONDS * 2))
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+
+        slot = True
+        if self._directory is not None:
+            slot = self._acquire_file_slot(deadline, cancel)
+            if slot is None:
+                self._release_local()
+                if cancel is None or not cancel.is_set():
+                    self.count("rejected_timeout")
+                return None
+        with self._condition:
+            self._stats["admitted"] += 1
+        return slot
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self._queue_timeout
+        waiter = None
+        with self._condition:
+            if self._active < self._max_concurrent:
+                self._active += 1
+            elif self._waiting >= self._max_queue:
+                self._stats["rejected_queue_full"] += 1
+                return None
+            else:
+                waiter = loop.create_future()
+                self._async_waiters.append(waiter)
+                self._waiting += 1
+                self._stats["queued"] += 1
+                self._stats["max_waiting"] = max(self._stats["max_waiting"], self._waiting)
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                self.count("rejected_timeout")
+                return None
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+
+        slot = True
+        if self._directory is not None:
+            try:
+                slot = await self._acquire_file_slot_async(deadline)
+            except asyncio.CancelledError:
+                self._release_local()
+                raise
+            if slot is None:
+                self._release_local()
+                self.count("rejected_timeout")
+                return None
+        self.count("admitted")
+        return slot
+
+    def _abandon(self, waiter):
+        with self._condition:
+            try:
+                self._async_waiters.remove(waiter)
+                self._waiting -= 1
+                return
+            except ValueError:
+                pass
+        # A release already handed this waiter a slot; _grant frees it if the waiter was cancelled first.
+        if waiter.done() and not waiter.cancelled():
+            self._release_local()
+
+    def _grant(self, waiter):
+        if waiter.done():
+            self._release_local()
+        else:
+            waiter.set_result(True)
+
+    def release(self, slot):
+        if slot is None:
+            return
+        if slot is not True:
+            try:
+                fcntl.flock(slot, fcntl.LOCK_UN)
+            finally:
+                slot.close()
+        self._release_local()
+
+    def count(self, name: str):
+        with self._condition:
+            self._stats[name] += 1
+
+    def _release_local(self):
+        with self._condition:
+            waiter = self._async_waiters.popleft() if self._async_waiters else None
+            if waiter is None:
+                self._active -= 1
+                self._condition.notify()
+            else:
+                # The slot passes straight to the waiting task, so no thread can take it in between.
+                self._waiting -= 1
+        if waiter is not None:
+            try:
+                waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+            except RuntimeError:
+                self._release_local()
+
+    def _try_file_slot(self):
+        # One lock file per browser slot, shared by every worker in the container. Locks die with the process.
+        for index in range(self._max_concurrent):
+            handle = open(os.path.join(self._directory, f"slot-{index}.lock"), "a+")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except BlockingIOError:
+                handle.close()
+        return None
+
+    def _acquire_file_slot(self, deadline: float, cancel=None):
+        while True:
+            handle = self._try_file_slot()
+            if handle is not None:
+                return handle
+            if time.monotonic() >= deadline or (cancel is not None and cancel.is_set()):
+                logging.getLogger(__name__).warning("No free scraper slot in %s.", self._directory)
+                return None
+            time.sleep(_POLL_SECONDS)
+
+    async def _acquire_file_slot_async(self, deadline: float):
+        while True:
+            handle = self._try_file_slot()
+            if handle is not None:
+                return handle
+            if time.monotonic() >= deadline:
+                logging.getLogger(__name__).warning("No free scraper slot in %s.", self._directory)
+                return None
+            await asyncio.sleep(_POLL_SECONDS)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_concurrent": self._max_concurrent,
+                "max_queue": self._max_queue,
+                "shared_dir": self._directory,
+                "active": self._active,
+                "waiting": self._waiting,
+                **self._stats,
+            }
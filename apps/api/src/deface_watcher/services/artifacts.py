@@ -1,18 +1,191 @@
+import hashlib
 import logging
 import os
-from threading import Lock
+import time
+from threading import Lock, Thread
 
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.text import tokenizer_from_json
+import numpy as np
 
 from ..config import load_settings
+from .preprocess import preprocess_texts
+from .tokenizer import VocabTokenizer
 
 _LOCK = Lock()
 _CACHE = None
+_STAMP = None
+_TOKENIZER = None
+_TOKENIZER_STAMP = None
+_VERSIONED_TOKENIZER = None
+_LOAD_MS = None
+_SWAP_LOCK = Lock()
+_SWAP = {
+    "state": "idle",
+    "last_result": None,
+    "last_error": None,
+    "previous_version": None,
+    "swapped_at": None,
+    "load_ms": None,
+    "warmup_ms": None,
+    "sanity": None,
+    "swaps": 0,
+    "failures": 0,
+    "rejected": None,
+}
+_WATCHER_PID = None
+
+_SANITY_TEXTS = (
+    "Welcome to our homepage. Contact us for more information.",
+    "Hacked by anonymous. Your security is low.",
+)
+
+INFERENCE_ENGINES = ("keras", "numpy")
+
+
+def _build_inference_fn(model, max_length: int):
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=[None, max_length], dtype=tf.int32)])
+    def serve(tokens):
+        return model(tokens, training=False)
+
+    serve.get_concrete_function()
+
+    def infer(processed):
+        tokens = tf.convert_to_tensor(np.asarray(processed, dtype=np.int32))
+        return serve(tokens).numpy()
+
+    return infer
+
+
+def _load_keras_model(settings):
+    from tensorflow.keras.models import load_model
+
+    if not settings.model_path.exists():
+        raise FileNotFoundError(f"Model not found: {settings.model_path}")
+    model = load_model(settings.model_path)
+    return model, _build_inference_fn(model, settings.max_length)
+
+
+def _load_numpy_model(settings):
+    from .numpy_engine import NumpyBiLSTM
+
+    if not settings.numpy_weights_path.exists():
+        raise FileNotFoundError(f"NumPy weights not found: {settings.numpy_weights_path}")
+    model = NumpyBiLSTM.load(settings.numpy_weights_path)
+    return model, model.predict
+
+
+def _load_tokenizer(settings):
+    logger = logging.getLogger(__name__)
+    if settings.vocab_path.exists():
+        try:
+            return VocabTokenizer.from_vocab_file(settings.vocab_path), settings.vocab_path
+        except (OSError, ValueError, KeyError):
+            logger.warning("Invalid vocabulary artifact %s, falling back to JSON.", settings.vocab_path)
+
+    if not settings.tokenizer_path.exists():
+        raise FileNotFoundError(f"Tokenizer not found: {settings.tokenizer_path}")
+    with settings.tokenizer_path.open("r", encoding="utf-8") as handle:
+        return VocabTokenizer.from_json(handle.read()), settings.tokenizer_path
+
+
+def load_tokenizer():
+    global _TOKENIZER, _TOKENIZER_STAMP
+    if _TOKENIZER is not None:
+        return _TOKENIZER
+
+    with _LOCK:
+        if _TOKENIZER is None:
+            _TOKENIZER_STAMP = _current_stamp()
+            _TOKENIZER = _load_tokenizer(load_settings())
+        return _TOKENIZER
+
+
+def load_versioned_tokenizer(stale_version=None):
+    global _TOKENIZER, _TOKENIZER_STAMP, _VERSIONED_TOKENIZER
+    current = _VERSIONED_TOKENIZER
+    if current is not None and current[1] != stale_version:
+        return current
+
+    with _LOCK:
+        if _VERSIONED_TOKENIZER is not current:
+            return _VERSIONED_TOKENIZER
+        settings = load_settings()
+        for _ in range(3):
+            stamp = _current_stamp()
+            if current is not None and stamp == _TOKENIZER_STAMP:
+                # Files unchanged since the last load: the cached pair is still the best this worker can do.
+                return current
+            if _TOKENIZER is None or stamp != _TOKENIZER_STAMP:
+                _TOKENIZER_STAMP = stamp
+                _TOKENIZER = _load_tokenizer(settings)
+            version = _artifacts_version(settings, _model_path(settings), _TOKENIZER[1])
+            if _current_stamp() == stamp:
+                break
+        # Same hash as the sidecar computes, so its responses can be matched against this tokenizer.
+        _VERSIONED_TOKENIZER = (_TOKENIZER[0], version)
+        return _VERSIONED_TOKENIZER
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifacts_version(settings, model_path, tokenizer_path):
+    digest = hashlib.sha256(f"{settings.inference_engine}:{settings.max_length}".encode("utf-8"))
+    for path in (model_path, tokenizer_path):
+        digest.update(_file_digest(path).encode("ascii"))
+    return digest.hexdigest()[:16]
+
+
+def _model_path(settings):
+    return settings.numpy_weights_path if settings.inference_engine == "numpy" else settings.model_path
+
+
+def _tokenizer_source(settings):
+    return settings.vocab_path if settings.vocab_path.exists() else settings.tokenizer_path
+
+
+def _file_stamp(*paths):
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def _load_artifacts(settings, tokenizer=None):
+    logger = logging.getLogger(__name__)
+    if settings.inference_engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown INFERENCE_ENGINE: {settings.inference_engine}")
+
+    model_path = _model_path(settings)
+    logger.info(
+        "Loading artifacts (pid=%s): engine=%s model=%s tokenizer=%s",
+        os.getpid(),
+        settings.inference_engine,
+        model_path,
+        _tokenizer_source(settings),
+    )
+    stamp = _file_stamp(model_path, _tokenizer_source(settings))
+    if settings.inference_engine == "numpy":
+        model, infer = _load_numpy_model(settings)
+    else:
+        model, infer = _load_keras_model(settings)
+    tokenizer, tokenizer_path = tokenizer or _load_tokenizer(settings)
+    version = _artifacts_version(settings, model_path, tokenizer_path)
+    return (model, tokenizer, infer, version), stamp
 
 
 def get_artifacts():
-    global _CACHE
+    global _CACHE, _LOAD_MS, _STAMP
     if _CACHE is not None:
         return _CACHE
 
@@ -20,24 +193,153 @@ def get_artifacts():
         if _CACHE is not None:
             return _CACHE
 
-        settings = load_settings()
+        start = time.time()
+        _CACHE, _STAMP = _load_artifacts(load_settings(), _TOKENIZER)
+        _LOAD_MS = round((time.time() - start) * 1000, 1)
         logger = logging.getLogger(__name__)
-        logger.info(
-            "Loading artifacts (pid=%s): model=%s tokenizer=%s",
-            os.getpid(),
-            settings.model_path,
-            settings.tokenizer_path,
+        logger.info("Artifacts loaded successfully (pid=%s, version=%s).", os.getpid(), _CACHE[3])
+        return _CACHE
+
+
+def get_artifacts_version():
+    return get_artifacts()[3]
+
+
+def get_loaded_version():
+    cache = _CACHE
+    return cache[3] if cache is not None else None
+
+
+def get_load_ms():
+    return _LOAD_MS
+
+
+def _warm_up(infer, max_length: int, batch_sizes):
+    timings = {}
+    for size in batch_sizes:
+        if size <= 0:
+            continue
+        start = time.time()
+        infer(np.zeros((size, max_length), dtype=np.int32))
+        timings[size] = round((time.time() - start) * 1000, 1)
+    return timings
+
+
+def warm_up(batch_sizes):
+    return _warm_up(get_artifacts()[2], load_settings().max_length, batch_sizes)
+
+
+def _sanity_check(artifacts, settings):
+    _, tokenizer, infer, _ = artifacts
+    processed = preprocess_texts(list(_SANITY_TEXTS), tokenizer, settings.max_length)
+    output = np.asarray(infer(processed))
+    if output.shape != (len(_SANITY_TEXTS), 2):
+        raise ValueError(f"Unexpected output shape {output.shape}")
+    if not np.all(np.isfinite(output)) or np.any(output < 0) or np.any(output > 1):
+        raise ValueError("Output is not a probability distribution")
+    return [round(float(row[1]), 4) for row in output]
+
+
+def _swap(stamp, force: bool):
+    global _CACHE, _STAMP
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    start = time.time()
+    try:
+        candidate, loaded_stamp = _load_artifacts(settings)
+        current = get_artifacts()
+        if candidate[3] == current[3] and not force:
+            with _SWAP_LOCK:
+                _SWAP.update(state="idle", last_result="unchanged")
+            _STAMP = loaded_stamp
+            return
+        warmup_ms = _warm_up(candidate[2], settings.max_length, settings.warmup_batch_sizes)
+        sanity = _sanity_check(candidate, settings)
+    except Exception as exc:
+        logger.exception("Model reload failed, keeping version %s.", _CACHE[3] if _CACHE else None)
+        with _SWAP_LOCK:
+            _SWAP.update(state="idle", last_result="failed", last_error=f"{type(exc).__name__}: {exc}", rejected=stamp)
+            _SWAP["failures"] += 1
+        return
+
+    with _LOCK:
+        previous = _CACHE
+        # Requests that already hold the old tuple finish on it; new ones pick up the candidate.
+        _CACHE = candidate
+        _STAMP = loaded_stamp
+    with _SWAP_LOCK:
+        _SWAP.update(
+            state="idle",
+            last_result="swapped",
+            last_error=None,
+            previous_version=previous[3] if previous else None,
+            swapped_at=time.time(),
+            load_ms=round((time.time() - start) * 1000, 1),
+            warmup_ms=warmup_ms,
+            sanity=sanity,
+            rejected=None,
         )
+        _SWAP["swaps"] += 1
+    logger.info(
+        "Swapped artifacts (pid=%s): %s -> %s.", os.getpid(), previous[3] if previous else None, candidate[3]
+    )
 
-        if not settings.model_path.exists():
-            raise FileNotFoundError(f"Model not found: {settings.model_path}")
-        if not settings.tokenizer_path.exists():
-            raise FileNotFoundError(f"Tokenizer not found: {settings.tokenizer_path}")
 
-        model = load_model(settings.model_path)
-        with settings.tokenizer_path.open("r", encoding="utf-8") as handle:
-            tokenizer = tokenizer_from_json(handle.read())
+def reload_artifacts(force: bool = False, wait: bool = False):
+    with _SWAP_LOCK:
+        if _SWAP["state"] == "loading":
+            return False
+        _SWAP["state"] = "loading"
+    stamp = _current_stamp()
+    if wait:
+        _swap(stamp, force)
+    else:
+        Thread(target=_swap, args=(stamp, force), name="artifacts-reload", daemon=True).start()
+    return True
 
-        _CACHE = (model, tokenizer)
-        logger.info("Artifacts loaded successfully (pid=%s).", os.getpid())
-        return _CACHE
+
+def _current_stamp():
+    settings = load_settings()
+    return _file_stamp(_model_path(settings), _tokenizer_source(settings))
+
+
+def _watch(interval: float):
+    logger = logging.getLogger(__name__)
+    previous = None
+    while True:
+        time.sleep(interval)
+        try:
+            stamp = _current_stamp()
+            with _SWAP_LOCK:
+                rejected = _SWAP["rejected"]
+            changed = _CACHE is not None and stamp is not None and stamp != _STAMP and stamp != rejected
+            # Only reload once the files have stopped changing, so a half-copied model is never picked up.
+            if changed and stamp == previous:
+                reload_artifacts(wait=True)
+            previous = stamp
+        except Exception:
+            logger.warning("Artifact watcher failed.", exc_info=True)
+
+
+def start_watcher(interval: float):
+    global _WATCHER_PID
+    if interval <= 0 or _WATCHER_PID == os.getpid():
+        return
+    with _SWAP_LOCK:
+        if _WATCHER_PID == os.getpid():
+            return
+        _WATCHER_PID = os.getpid()
+    Thread(target=_watch, args=(interval,), name="artifacts-watcher", daemon=True).start()
+
+
+def get_model_stats():
+    with _SWAP_LOCK:
+        swap = dict(_SWAP)
+    swap.pop("rejected")
+    return {
+        "version": _CACHE[3] if _CACHE is not None else None,
+        "engine": load_settings().inference_engine,
+        "load_ms": _LOAD_MS,
+        "watching": _WATCHER_PID == os.getpid(),
+        **swap,
+    }
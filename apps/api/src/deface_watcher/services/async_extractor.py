@@ -0,0 +1,343 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from http.cookiejar import DefaultCookiePolicy
+from threading import Lock
+
+import httpx
+
+from ..config import load_settings
+from .extractor import (
+    _FALLBACK_CHUNK_BYTES,
+    _NOT_MODIFIED,
+    _PENDING,
+    _circuit_allows,
+    _classify_fallback_error,
+    _conditional_get,
+    _extraction_flow,
+    _fallback_failure,
+    _fallback_result,
+    _get_admission,
+    _get_daemon_client,
+    _hedge_step,
+    _observe_comparison,
+    _passes_quality_gate,
+    _page_timeout_ms,
+    _puppeteer_exception_error,
+    _puppeteer_exit,
+    _puppeteer_result,
+    _race_hedged,
+    _scrape_both,
+    _try_fallback,
+    _try_puppeteer,
+)
+from .admission import ScraperOverloaded
+from .html_text import HtmlTextStream
+from .process_group import (
+    group_alive,
+    kill_tree,
+    limit_exceeded,
+    record_kill,
+    register,
+    session_kwargs,
+    start_reaper,
+    unregister,
+)
+
+_CLIENT = None
+_CLIENT_LOOP = None
+_WATCH_SECONDS = 0.25
+_HTTPX_ERRORS = (httpx.TimeoutException, httpx.HTTPStatusError, httpx.TransportError)
+
+_BLOCKING_LOCK = Lock()
+_BLOCKING_EXECUTOR = None
+_BACKGROUND = set()
+
+
+def _get_client(settings):
+    global _CLIENT, _CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _CLIENT is None or _CLIENT_LOOP is not loop:
+        _CLIENT = httpx.AsyncClient(
+            headers=settings.request_headers,
+            timeout=settings.request_timeout,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=settings.async_max_connections,
+                max_keepalive_connections=settings.http_pool_maxsize,
+            ),
+        )
+        # The client copies any jar it is given, so the policy has to go on the jar it actually keeps.
+        _CLIENT.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        _CLIENT_LOOP = loop
+    return _CLIENT
+
+
+async def close_client():
+    global _CLIENT, _CLIENT_LOOP, _BLOCKING_EXECUTOR
+    client, _CLIENT, _CLIENT_LOOP = _CLIENT, None, None
+    if client is not None:
+        await client.aclose()
+    executor, _BLOCKING_EXECUTOR = _BLOCKING_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _get_blocking_executor(settings):
+    global _BLOCKING_EXECUTOR
+    if _BLOCKING_EXECUTOR is not None:
+        return _BLOCKING_EXECUTOR
+
+    with _BLOCKING_LOCK:
+        if _BLOCKING_EXECUTOR is None:
+            _BLOCKING_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, settings.async_blocking_workers),
+                thread_name_prefix="async-blocking",
+            )
+        return _BLOCKING_EXECUTOR
+
+
+def _reset_after_fork():
+    global _BLOCKING_EXECUTOR
+    _BLOCKING_EXECUTOR = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def run_blocking(settings, fn, *args):
+    # SQLite and /proc reads stay off the event loop and out of the shared default executor.
+    return await asyncio.get_running_loop().run_in_executor(_get_blocking_executor(settings), fn, *args)
+
+
+async def _run_puppeteer(url: str, settings):
+    admission = _get_admission(settings)
+    if admission is None:
+        return await _launch_puppeteer(url, settings)
+
+    slot = await admission.acquire_async()
+    if slot is None:
+        raise ScraperOverloaded(settings.scraper_retry_after)
+    try:
+        return await _launch_puppeteer(url, settings)
+    finally:
+        admission.release(slot)
+
+
+async def _launch_puppeteer(url: str, settings):
+    if settings.scraper_mode == "daemon":
+        return await _get_daemon_client(settings).fetch_async(
+            url, timeout=settings.process_timeout, page_timeout_ms=_page_timeout_ms(settings)
+        )
+
+    start_reaper(settings.scraper_reaper_interval)
+    process = await asyncio.create_subprocess_exec(
+        "node",
+        str(settings.scraper_js_path),
+        url,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **session_kwargs(),
+    )
+    register(process.pid, settings.process_timeout)
+    communicate = asyncio.ensure_future(process.communicate())
+    deadline = time.monotonic() + settings.process_timeout
+    error = None
+    try:
+        while not communicate.done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = "timeout"
+                break
+            await asyncio.wait({communicate}, timeout=min(remaining, _WATCH_SECONDS))
+            if communicate.done():
+                break
+            if process.returncode is not None:
+                kill_tree(process)
+                continue
+            error = await run_blocking(
+                settings, limit_exceeded, process.pid, settings.scraper_max_rss_mb, settings.scraper_max_cpu_seconds
+            )
+            if error is not None:
+                break
+        if error is not None:
+            record_kill(error)
+            kill_tree(process)
+            await communicate
+            return None, f"puppeteer_{error}", {}
+        stdout, stderr = communicate.result()
+    finally:
+        if not communicate.done():
+            record_kill("cancelled")
+            communicate.cancel()
+        if process.returncode is None or await run_blocking(settings, group_alive, process.pid):
+            kill_tree(process)
+        unregister(process.pid)
+
+    stdout = stdout.decode("utf-8", errors="replace")
+    return _puppeteer_exit(process.returncode, stdout, stderr.decode("utf-8", errors="replace"), None)
+
+
+@asynccontextmanager
+async def _stream(client, url: str, headers=None):
+    # Redirects are followed here so cookies set along one chain stay with that chain and never reach the client.
+    cookies = httpx.Cookies()
+    request = client.build_request("GET", url, headers=headers)
+    for _ in range(client.max_redirects + 1):
+        cookies.set_cookie_header(request)
+        response = await client.send(request, stream=True)
+        cookies.extract_cookies(response)
+        if response.next_request is None:
+            break
+        await response.aclose()
+        request = response.next_request
+    else:
+        raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.", request=request)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+async def _run_fallback(url: str, settings, conditional=None):
+    async with _stream(_get_client(settings), url, conditional) as response:
+        if response.status_code == 304:
+            return _NOT_MODIFIED, {}
+        response.raise_for_status()
+        stream = HtmlTextStream(
+            settings.max_chars,
+            max_bytes=settings.fallback_max_bytes,
+            content_type=response.headers.get("Content-Type"),
+        )
+        async for chunk in response.aiter_bytes(_FALLBACK_CHUNK_BYTES):
+            if stream.feed(chunk):
+                break
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    return stream.finish(), validators
+
+
+async def _try_puppeteer_async(url: str, settings):
+    if not _circuit_allows(url, "puppeteer"):
+        return None, "puppeteer_circuit_open", 0.0, {}
+    start = time.time()
+    try:
+        text, error, validators = await _run_puppeteer(url, settings)
+    except Exception as exc:
+        text, error, validators = None, _puppeteer_exception_error(exc), {}
+    return _puppeteer_result(url, settings, start, text, error, validators)
+
+
+async def _try_fallback_async(url: str, settings, conditional=None):
+    if not _circuit_allows(url, "requests"):
+        return None, "requests_circuit_open", 0.0, {}
+    start = time.time()
+    try:
+        text, validators = await _run_fallback(url, settings, conditional)
+    except Exception as exc:
+        return _fallback_failure(url, start, _classify_fallback_error(exc, *_HTTPX_ERRORS))
+    return _fallback_result(url, start, text, validators)
+
+
+async def _race_hedged_async(url: str, settings):
+    start = time.time()
+    puppeteer = asyncio.ensure_future(_try_puppeteer_async(url, settings))
+    fallback = None
+    fallback_started_ms = None
+    grace_spent = False
+
+    def state(task):
+        if task is None:
+            return None
+        return task.result() if task.done() else _PENDING
+
+    try:
+        if settings.hedge_delay_ms > 0:
+            await asyncio.wait({puppeteer}, timeout=settings.hedge_delay_ms / 1000)
+        while True:
+            action, winner = _hedge_step(settings, state(puppeteer), state(fallback), grace_spent)
+            if action == "done":
+                break
+            if action == "start_fallback":
+                fallback = asyncio.ensure_future(_try_fallback_async(url, settings))
+                fallback_started_ms = (time.time() - start) * 1000
+            elif action == "grace":
+                await asyncio.wait({puppeteer}, timeout=settings.hedge_grace_ms / 1000)
+                grace_spent = True
+            else:
+                pending = {task for task in (puppeteer, fallback) if not task.done()}
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        return (
+            (time.time() - start) * 1000,
+            puppeteer.result() if puppeteer.done() else None,
+            fallback.result() if fallback is not None and fallback.done() else None,
+            winner,
+            fallback_started_ms,
+            winner != "puppeteer" and not puppeteer.done(),
+            winner == "puppeteer" and fallback is not None and not fallback.done(),
+        )
+    finally:
+        for task in (puppeteer, fallback):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def _scrape_both_async(url: str, settings):
+    start = time.time()
+    puppeteer = asyncio.ensure_future(_try_puppeteer_async(url, settings))
+    fallback = asyncio.ensure_future(_try_fallback_async(url, settings))
+    finished, pending = set(), {puppeteer, fallback}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finished |= done
+        if any(_passes_quality_gate(task.result()[0], settings) for task in done):
+            break
+    scrape_time_ms = (time.time() - start) * 1000
+    if pending:
+        # The loop only keeps weak references to tasks, so the unfinished side is held here until it lands.
+        task = pending.pop()
+        _BACKGROUND.add(task)
+        task.add_done_callback(_BACKGROUND.discard)
+        task.add_done_callback(
+            lambda done: done.cancelled() or _observe_comparison(url, settings, puppeteer.result(), fallback.result())
+        )
+    return (
+        scrape_time_ms,
+        puppeteer.result() if puppeteer in finished else None,
+        fallback.result() if fallback in finished else None,
+    )
+
+
+async def _conditional_get_async(url: str, conditional: dict, settings):
+    return await _try_fallback_async(url, settings, conditional)
+
+
+_ASYNC_STEPS = {
+    _try_puppeteer: _try_puppeteer_async,
+    _try_fallback: _try_fallback_async,
+    _race_hedged: _race_hedged_async,
+    _scrape_both: _scrape_both_async,
+    _conditional_get: _conditional_get_async,
+}
+
+
+async def _run_flow(flow, settings):
+    result = None
+    while True:
+        try:
+            step, args = flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        handler = _ASYNC_STEPS.get(step)
+        result = await handler(*args) if handler is not None else await run_blocking(settings, step, *args)
+
+
+async def extract_text_async(url: str, overload=None):
+    settings = load_settings()
+    return await _run_flow(_extraction_flow(url, settings, overload), settings)
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+_LATENCY_WINDOW = 1024
+
+
+class _Pending:
+    __slots__ = ("rows", "key", "enqueued_at", "event", "result", "error")
+
+    def __init__(self, rows, key):
+        self.rows = rows
+        self.key = key
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return round(float(np.percentile(values, q)), 3)
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch_size: int, max_wait_ms: float):
+        self._run_batch = run_batch
+        self._max_batch_size = max(1, int(max_batch_size))
+        self._max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued_rows = 0
+        self._thread = None
+        self._pid = None
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._errors = 0
+        self._batch_sizes = {}
+        self._latencies_ms = deque(maxlen=_LATENCY_WINDOW)
+        self._inference_ms = deque(maxlen=_LATENCY_WINDOW)
+
+    def submit(self, rows, key=None):
+        pending = _Pending(rows, key)
+        with self._cond:
+            self._ensure_thread()
+            self._queue.append(pending)
+            self._queued_rows += len(rows)
+            self._cond.notify()
+
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            deadline = self._queue[0].enqueued_at + self._max_wait
+            while self._queued_rows < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            batch_rows = 0
+            while self._queue:
+                size = len(self._queue[0].rows)
+                if batch and (batch_rows + size > self._max_batch_size or self._queue[0].key is not batch[0].key):
+                    break
+                batch.append(self._queue.popleft())
+                batch_rows += size
+            self._queued_rows -= batch_rows
+            return batch, batch_rows
+
+    def _loop(self):
+        logger = logging.getLogger(__name__)
+        while True:
+            batch, batch_rows = self._next_batch()
+            start = time.monotonic()
+            try:
+                stacked = batch[0].rows if len(batch) == 1 else np.concatenate([item.rows for item in batch])
+                output = self._run_batch(stacked, batch[0].key)
+            except Exception as exc:
+                logger.exception("Micro-batch inference failed (rows=%s)", batch_rows)
+                for item in batch:
+                    item.error = exc
+                    item.event.set()
+                with self._stats_lock:
+                    self._errors += len(batch)
+                continue
+
+            finished = time.monotonic()
+            offset = 0
+            for item in batch:
+                size = len(item.rows)
+                item.result = output[offset : offset + size]
+                offset += size
+                item.event.set()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._rows += batch_rows
+                self._batch_sizes[batch_rows] = self._batch_sizes.get(batch_rows, 0) + 1
+                self._inference_ms.append((finished - start) * 1000)
+                self._latencies_ms.extend((finished - item.enqueued_at) * 1000 for item in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = list(self._latencies_ms)
+            inference = list(self._inference_ms)
+            return {
+                "max_batch_size": self._max_batch_size,
+                "max_wait_ms": self._max_wait * 1000,
+                "queued_rows": self._queued_rows,
+                "batches": self._batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                "errors": self._errors,
+                "avg_batch_size": round(self._rows / self._batches, 3) if self._batches else None,
+                "batch_sizes": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "latency_ms": {
+                    "p50": _percentile(latencies, 50),
+                    "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99),
+                },
+                "inference_ms": {
+                    "p50": _percentile(inference, 50),
+                    "p95": _percentile(inference, 95),
+                    "p99": _percentile(inference, 99),
+                },
+            }
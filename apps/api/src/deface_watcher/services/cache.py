@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_PRUNE_EVERY = 200
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: float):
+        self._max_size = max(1, int(max_size))
+        self._ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self._ttl > 0 and now - stored_at > self._ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value, stored_at
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._items[key] = (value, time.time() if stored_at is None else stored_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SqliteCache:
+    def __init__(self, path, ttl: float, max_entries: int, table: str = "cache"):
+        self._path = str(path)
+        self._ttl = float(ttl)
+        self._max_entries = max(1, int(max_entries))
+        self._table = table
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {self._table}_stored_at ON {self._table} (stored_at)")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        try:
+            row = self._connect().execute(
+                f"SELECT value, stored_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            logging.getLogger(__name__).warning("Shared cache read failed (%s).", self._path, exc_info=True)
+            return None
+        if row is None:
+            return None
+        value, stored_at = row
+        if self._ttl > 0 and time.time() - stored_at > self._ttl:
+            return None
+        return json.loads(value), stored_at
+
+    def set(self, key, value, stored_at=None):
+        stored_at = time.time() if stored_at is None else stored_at
+        try:
+            connection = self._connect()
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), stored_at),
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % _PRUNE_EVERY == 0
+            if prune:
+                self._prune(connection)
+        except sqlite3.Error:
+            logging.getLogger(__name__).warning("Shared cache write failed (%s).", self._path, exc_info=True)
+
+    def _prune(self, connection):
+        if self._ttl > 0:
+            connection.execute(f"DELETE FROM {self._table} WHERE stored_at < ?", (time.time() - self._ttl,))
+        connection.execute(
+            f"DELETE FROM {self._table} WHERE key IN "
+            f"(SELECT key FROM {self._table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_entries,),
+        )
+
+    def clear(self):
+        try:
+            self._connect().execute(f"DELETE FROM {self._table}")
+        except sqlite3.Error:
+            logging.getLogger(__name__).warning("Shared cache clear failed (%s).", self._path, exc_info=True)
+
+
+class TieredCache:
+    def __init__(self, memory: LRUCache, shared=None):
+        self._memory = memory
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._hits = {"memory": 0, "shared": 0}
+        self._misses = 0
+
+    def get(self, key):
+        entry = self._memory.get(key)
+        tier = "memory"
+        if entry is None and self._shared is not None:
+            entry = self._shared.get(key)
+            tier = "shared"
+            if entry is not None:
+                self._memory.set(key, entry[0], stored_at=entry[1])
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits[tier] += 1
+        return entry
+
+    def set(self, key, value):
+        stored_at = time.time()
+        self._memory.set(key, value, stored_at=stored_at)
+        if self._shared is not None:
+            self._shared.set(key, value, stored_at=stored_at)
+
+    def clear(self):
+        self._memory.clear()
+        if self._shared is not None:
+            self._shared.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = sum(self._hits.values())
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._memory),
+                "shared": self._shared is not None,
+                "hits": dict(self._hits),
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+def host_of(url: str):
+    try:
+        return (urlsplit(url).hostname or "").lower() or None
+    except ValueError:
+        return None
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "cooldown", "probe_until", "last_error", "trips")
+
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.cooldown = 0.0
+        self.probe_until = 0.0
+        self.last_error = None
+        self.trips = 0
+
+
+class CircuitBreakers:
+    def __init__(self, threshold: int, cooldown: float, max_cooldown: float, max_hosts: int):
+        self._threshold = max(1, int(threshold))
+        self._cooldown = float(cooldown)
+        self._max_cooldown = max(float(max_cooldown), self._cooldown)
+        self._max_hosts = max(1, int(max_hosts))
+        self._lock = threading.Lock()
+        self._circuits = OrderedDict()
+        self._stats = {"short_circuited": 0, "opened": 0, "closed": 0}
+
+    def allow(self, host, channel: str):
+        if host is None:
+            return True
+        now = time.time()
+        with self._lock:
+            circuit = self._circuits.get((host, channel))
+            if circuit is None or circuit.state == "closed":
+                return True
+            if now < circuit.opened_at + circuit.cooldown or now < circuit.probe_until:
+                self._stats["short_circuited"] += 1
+                return False
+            # Half-open: let a single probe through; if it never reports back, another one may go after a cooldown.
+            circuit.state = "half_open"
+            circuit.probe_until = now + self._cooldown
+            return True
+
+    def record(self, host, channel: str, ok: bool, error=None):
+        if host is None:
+            return
+        now = time.time()
+        key = (host, channel)
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if ok:
+                if circuit is not None:
+                    if circuit.state != "closed":
+                        self._stats["closed"] += 1
+                    del self._circuits[key]
+                return
+
+            if circuit is None:
+                circuit = _Circuit()
+                self._circuits[key] = circuit
+                while len(self._circuits) > self._max_hosts:
+                    self._circuits.popitem(last=False)
+            self._circuits.move_to_end(key)
+            circuit.failures += 1
+            circuit.last_error = error
+            if circuit.state == "half_open":
+                circuit.cooldown = min(circuit.cooldown * 2, self._max_cooldown)
+                self._open(circuit, now)
+            elif circuit.state == "closed" and circuit.failures >= self._threshold:
+                circuit.cooldown = self._cooldown
+                self._open(circuit, now)
+
+    def _open(self, circuit, now):
+        circuit.state = "open"
+        circuit.opened_at = now
+        circuit.probe_until = 0.0
+        circuit.trips += 1
+        self._stats["opened"] += 1
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            items = list(self._circuits.items())
+        circuits = []
+        for (host, channel), circuit in items:
+            retry_in = None
+            if circuit.state != "closed":
+                retry_in = max(0.0, circuit.opened_at + circuit.cooldown - now)
+            circuits.append(
+                {
+                    "host": host,
+                    "channel": channel,
+                    "state": circuit.state,
+                    "failures": circuit.failures,
+                    "trips": circuit.trips,
+                    "last_error": circuit.last_error,
+                    "cooldown_s": round(circuit.cooldown, 1),
+                    "retry_in_s": round(retry_in, 1) if retry_in is not None else None,
+                }
+            )
+        return circuits
+
+    def stats(self):
+        with self._lock:
+            states = [circuit.state for circuit in self._circuits.values()]
+            return {
+                "tracked": len(states),
+                "open": states.count("open"),
+                "half_open": states.count("half_open"),
+                **self._stats,
+            }
@@ -1,11 +1,57 @@
+import hashlib
 import logging
+import os
 import subprocess
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Event, Lock
 
 import requests
-from bs4 import BeautifulSoup
 
 from ..config import load_settings
+from .admission import AdmissionLimiter, ScraperOverloaded
+from .cache import LRUCache, SqliteCache, TieredCache
+from .circuit_breaker import CircuitBreakers, host_of
+from .html_text import extract_html_text
+from .http_client import get_http_stats, get_session
+from .process_group import get_process_stats, run_supervised, start_reaper
+from .scraper_daemon import ScraperDaemonClient
+from .source_router import SourceRouter, text_similarity
+
+_DAEMON_LOCK = Lock()
+_DAEMON = None
+
+_ADMISSION_LOCK = Lock()
+_ADMISSION = None
+
+_BREAKERS_LOCK = Lock()
+_BREAKERS = None
+
+_ROUTER_LOCK = Lock()
+_ROUTER = None
+
+_EXECUTORS_LOCK = Lock()
+_EXECUTORS = {}
+_FALLBACK_CHUNK_BYTES = 16384
+_PAGE_TIMEOUT_MARGIN_MS = 1000
+_HOST_NAVIGATION_ERRORS = ("net::ERR_", "Navigation timeout")
+_LOCAL_NAVIGATION_ERRORS = (
+    "net::ERR_INTERNET_DISCONNECTED",
+    "net::ERR_NETWORK_CHANGED",
+    "net::ERR_PROXY_CONNECTION_FAILED",
+    "net::ERR_ABORTED",
+)
+_REQUESTS_ERRORS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.HTTPError,
+    requests.exceptions.ConnectionError,
+)
+_PENDING = object()
+_NOT_MODIFIED = object()
+
+_VALIDATORS_LOCK = Lock()
+_VALIDATORS = None
+_REVALIDATION_STATS = {"conditional_requests": 0, "not_modified": 0, "content_unchanged": 0}
 
 
 def _normalize_text(text: str, max_chars: int):
@@ -15,83 +61,704 @@ def _normalize_text(text: str, max_chars: int):
     return cleaned, False
 
 
-def _run_puppeteer(url: str):
+def _page_timeout_ms(settings):
+    # Navigation must give up before the client deadline, so the daemon can still report why it failed.
+    return max(1, min(settings.scraper_page_timeout_ms, settings.process_timeout * 1000 - _PAGE_TIMEOUT_MARGIN_MS))
+
+
+def _get_daemon_client(settings):
+    global _DAEMON
+    if _DAEMON is not None:
+        return _DAEMON
+
+    with _DAEMON_LOCK:
+        if _DAEMON is None:
+            env = dict(os.environ)
+            env.update(
+                {
+                    "SCRAPER_POOL_SIZE": str(settings.scraper_pool_size),
+                    "SCRAPER_MAX_PAGES_PER_BROWSER": str(settings.scraper_max_pages_per_browser),
+                    "SCRAPER_PAGE_TIMEOUT_MS": str(settings.scraper_page_timeout_ms),
+                    "MAX_TEXT_LEN": str(settings.max_chars),
+                }
+            )
+            _DAEMON = ScraperDaemonClient(["node", str(settings.scraper_daemon_js_path)], env=env)
+        return _DAEMON
+
+
+def _get_admission(settings):
+    global _ADMISSION
+    if settings.scraper_max_concurrent <= 0:
+        return None
+    if _ADMISSION is not None:
+        return _ADMISSION
+
+    with _ADMISSION_LOCK:
+        if _ADMISSION is None:
+            _ADMISSION = AdmissionLimiter(
+                settings.scraper_max_concurrent,
+                settings.scraper_max_queue,
+                queue_timeout=settings.scraper_queue_timeout_ms / 1000,
+                directory=settings.scraper_slots_dir or None,
+            )
+        return _ADMISSION
+
+
+def _get_breakers(settings):
+    global _BREAKERS
+    if settings.circuit_failure_threshold <= 0:
+        return None
+    if _BREAKERS is not None:
+        return _BREAKERS
+
+    with _BREAKERS_LOCK:
+        if _BREAKERS is None:
+            _BREAKERS = CircuitBreakers(
+                settings.circuit_failure_threshold,
+                cooldown=settings.circuit_cooldown,
+                max_cooldown=settings.circuit_max_cooldown,
+                max_hosts=settings.circuit_max_hosts,
+            )
+        return _BREAKERS
+
+
+def _circuit_allows(url: str, channel: str):
+    breakers = _get_breakers(load_settings())
+    return breakers is None or breakers.allow(host_of(url), channel)
+
+
+def _record_outcome(url: str, channel: str, ok: bool, error=None):
+    breakers = _get_breakers(load_settings())
+    if breakers is not None:
+        breakers.record(host_of(url), channel, ok, error)
+
+
+def _puppeteer_host_failure(error, settings):
+    if error is None:
+        return False
+    if error in ("puppeteer_rss_limit", "puppeteer_cpu_limit"):
+        return True
+    if error == "puppeteer_timeout":
+        # A daemon timeout includes time queued behind other pages, so only the daemon's own navigation error counts.
+        return settings.scraper_mode != "daemon"
+    if not error.startswith("puppeteer_failed:"):
+        return False
+    # Browser launch, daemon crashes, cancellations and a missing module say nothing about the host.
+    message = error[len("puppeteer_failed:") :]
+    if any(marker in message for marker in _LOCAL_NAVIGATION_ERRORS):
+        return False
+    return any(marker in message for marker in _HOST_NAVIGATION_ERRORS)
+
+
+def _get_router(settings):
+    global _ROUTER
+    if settings.router_min_samples <= 0:
+        return None
+    if _ROUTER is not None:
+        return _ROUTER
+
+    with _ROUTER_LOCK:
+        if _ROUTER is None:
+            _ROUTER = SourceRouter(
+                settings.router_min_samples,
+                min_similarity=settings.router_min_similarity,
+                reprobe_every=settings.router_reprobe_every,
+                reprobe_interval=settings.router_reprobe_interval,
+                max_hosts=settings.router_max_hosts,
+            )
+        return _ROUTER
+
+
+def get_circuit_states():
+    breakers = _get_breakers(load_settings())
+    return breakers.snapshot() if breakers is not None else []
+
+
+def _get_validator_store(settings):
+    global _VALIDATORS
+    if settings.revalidate_max_age <= 0:
+        return None
+    if _VALIDATORS is not None:
+        return _VALIDATORS
+
+    with _VALIDATORS_LOCK:
+        if _VALIDATORS is None:
+            shared = None
+            if settings.revalidate_db:
+                shared = SqliteCache(
+                    settings.revalidate_db,
+                    ttl=settings.revalidate_max_age,
+                    max_entries=settings.revalidate_db_max_entries,
+                    table="validators",
+                )
+            _VALIDATORS = TieredCache(
+                LRUCache(settings.revalidate_cache_size, ttl=settings.revalidate_max_age),
+                shared=shared,
+            )
+        return _VALIDATORS
+
+
+def _count_revalidation(name: str):
+    with _VALIDATORS_LOCK:
+        _REVALIDATION_STATS[name] += 1
+
+
+def get_scraper_stats():
     settings = load_settings()
+    store = _get_validator_store(settings)
+    with _VALIDATORS_LOCK:
+        revalidation = dict(_REVALIDATION_STATS)
+    revalidation["store"] = store.stats() if store is not None else None
+    return {
+        "mode": settings.scraper_mode,
+        "daemon": _DAEMON.stats() if _DAEMON is not None else None,
+        "admission": _ADMISSION.stats() if _ADMISSION is not None else None,
+        "circuits": _BREAKERS.stats() if _BREAKERS is not None else None,
+        "routing": _ROUTER.stats() if _ROUTER is not None else None,
+        "processes": get_process_stats(),
+        "http": get_http_stats(),
+        "revalidation": revalidation,
+    }
+
+
+def _run_puppeteer(url: str, settings, cancel=None):
+    admission = _get_admission(settings)
+    if admission is None:
+        return _launch_puppeteer(url, settings, cancel)
+
+    slot = admission.acquire(cancel=cancel)
+    if slot is None:
+        if cancel is not None and cancel.is_set():
+            return None, "puppeteer_cancelled", {}
+        raise ScraperOverloaded(settings.scraper_retry_after)
+    try:
+        return _launch_puppeteer(url, settings, cancel)
+    finally:
+        admission.release(slot)
+
+
+def _launch_puppeteer(url: str, settings, cancel=None):
+    if settings.scraper_mode == "daemon":
+        return _get_daemon_client(settings).fetch(
+            url, timeout=settings.process_timeout, cancel=cancel, page_timeout_ms=_page_timeout_ms(settings)
+        )
+
+    start_reaper(settings.scraper_reaper_interval)
     command = ["node", str(settings.scraper_js_path), url]
-    result = subprocess.run(
+    returncode, stdout, stderr, error = run_supervised(
         command,
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
         timeout=settings.process_timeout,
-        check=False,
+        cancel=cancel,
+        max_rss_mb=settings.scraper_max_rss_mb,
+        max_cpu_seconds=settings.scraper_max_cpu_seconds,
     )
-    if result.returncode != 0:
-        stderr = (result.stderr or "").strip()
-        return None, f"puppeteer_failed:{stderr.splitlines()[0] if stderr else 'unknown'}"
+    if error == "cancelled":
+        return None, "puppeteer_cancelled", {}
+    if error == "timeout":
+        raise subprocess.TimeoutExpired(command, settings.process_timeout)
+    return _puppeteer_exit(returncode, stdout, stderr, error)
 
-    return result.stdout or "", None
 
+def _puppeteer_exit(returncode, stdout, stderr, error):
+    if error is not None:
+        return None, f"puppeteer_{error}", {}
+    if returncode != 0:
+        stderr = (stderr or "").strip()
+        return None, f"puppeteer_failed:{stderr.splitlines()[0] if stderr else 'unknown'}", {}
+    return stdout or "", None, {}
 
-def _run_fallback(url: str):
-    settings = load_settings()
-    response = requests.get(
+
+def _get_http_session(settings):
+    return get_session(
+        pool_connections=settings.http_pool_hosts,
+        pool_maxsize=settings.http_pool_maxsize,
+        dns_ttl=settings.dns_cache_ttl,
+    )
+
+
+def _run_fallback(url: str, settings, cancel=None, conditional=None):
+    session = _get_http_session(settings)
+    with session.get(
         url,
-        headers=settings.request_headers,
+        headers={**settings.request_headers, **(conditional or {})},
         timeout=settings.request_timeout,
         verify=False,
-    )
-    response.raise_for_status()
+        stream=True,
+    ) as response:
+        if response.status_code == 304:
+            return _NOT_MODIFIED, {}
+        response.raise_for_status()
+        raw_text, _ = extract_html_text(
+            response.iter_content(chunk_size=_FALLBACK_CHUNK_BYTES),
+            settings.max_chars,
+            max_bytes=settings.fallback_max_bytes,
+            content_type=response.headers.get("Content-Type"),
+            cancel=cancel,
+        )
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    return raw_text, validators
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    for script_or_style in soup(["script", "style", "noscript"]):
-        script_or_style.decompose()
 
-    raw_text = soup.get_text()
-    return raw_text
+def _puppeteer_exception_error(exc):
+    if isinstance(exc, ScraperOverloaded):
+        return "puppeteer_overloaded"
+    if isinstance(exc, FileNotFoundError):
+        return "node_not_found"
+    if isinstance(exc, subprocess.TimeoutExpired):
+        return "puppeteer_timeout"
+    return "puppeteer_error"
 
 
-def extract_text(url: str):
-    settings = load_settings()
-    logger = logging.getLogger(__name__)
+def _puppeteer_result(url: str, settings, start: float, text, error, validators):
+    if error and error != "puppeteer_cancelled":
+        logging.getLogger(__name__).warning("Puppeteer failed: %s", error)
+    if text is not None or _puppeteer_host_failure(error, settings):
+        _record_outcome(url, "puppeteer", text is not None, error)
+    return text, error, (time.time() - start) * 1000, validators
 
+
+def _try_puppeteer(url: str, settings, cancel=None):
+    if not _circuit_allows(url, "puppeteer"):
+        return None, "puppeteer_circuit_open", 0.0, {}
     start = time.time()
     try:
-        text, error = _run_puppeteer(url)
-        if error:
-            logger.warning("Puppeteer failed: %s", error)
-    except FileNotFoundError:
-        error = "node_not_found"
-        text = None
-        logger.warning("Puppeteer failed: %s", error)
-    except subprocess.TimeoutExpired:
-        error = "puppeteer_timeout"
-        text = None
-        logger.warning("Puppeteer failed: %s", error)
-    except Exception:
-        error = "puppeteer_error"
-        text = None
-        logger.warning("Puppeteer failed: %s", error)
+        text, error, validators = _run_puppeteer(url, settings, cancel=cancel)
+    except Exception as exc:
+        text, error, validators = None, _puppeteer_exception_error(exc), {}
+    return _puppeteer_result(url, settings, start, text, error, validators)
 
-    scrape_time_ms = (time.time() - start) * 1000
-    if text is not None:
-        normalized, truncated = _normalize_text(text, settings.max_chars)
-        return normalized, "Puppeteer", round(scrape_time_ms), truncated, None
 
+def _classify_fallback_error(exc, timeout_errors, status_errors, connection_errors):
+    if isinstance(exc, timeout_errors):
+        return "requests_timeout", False, "requests_timeout"
+    if isinstance(exc, status_errors):
+        status = exc.response.status_code if exc.response is not None else None
+        # A 4xx still proves the host is up; only 5xx counts against it.
+        return "requests_error", status is not None and status < 500, f"http_{status}"
+    if isinstance(exc, connection_errors):
+        return "requests_error", False, "requests_error"
+    return "requests_error", None, None
+
+
+def _fallback_result(url: str, start: float, text, validators):
+    if text is None:
+        return None, "requests_cancelled", (time.time() - start) * 1000, validators
+    _record_outcome(url, "requests", True)
+    return text, None, (time.time() - start) * 1000, validators
+
+
+def _fallback_failure(url: str, start: float, failure):
+    error, ok, reason = failure
+    if ok is not None:
+        _record_outcome(url, "requests", ok, reason)
+    logging.getLogger(__name__).warning("Requests fallback failed: %s", error)
+    return None, error, (time.time() - start) * 1000, {}
+
+
+def _try_fallback(url: str, settings, cancel=None, conditional=None):
+    if not _circuit_allows(url, "requests"):
+        return None, "requests_circuit_open", 0.0, {}
     start = time.time()
     try:
-        fallback_text = _run_fallback(url)
+        text, validators = _run_fallback(url, settings, cancel=cancel, conditional=conditional)
+    except Exception as exc:
+        return _fallback_failure(url, start, _classify_fallback_error(exc, *_REQUESTS_ERRORS))
+    return _fallback_result(url, start, text, validators)
+
+
+def _get_executor(kind: str, settings):
+    # Hedged and compare runs get separate pools, so a burst of one cannot queue the other's requests fallback.
+    executor = _EXECUTORS.get(kind)
+    if executor is not None:
+        return executor
+
+    with _EXECUTORS_LOCK:
+        if kind not in _EXECUTORS:
+            _EXECUTORS[kind] = ThreadPoolExecutor(
+                max_workers=max(2, settings.hedge_max_workers),
+                thread_name_prefix=f"extract-{kind}",
+            )
+        return _EXECUTORS[kind]
+
+
+def _reset_after_fork():
+    _EXECUTORS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _passes_quality_gate(text, settings):
+    return text is not None and len(" ".join(text.split())) >= settings.hedge_min_chars
+
+
+def _hedge_step(settings, puppeteer, fallback, grace_spent: bool):
+    # Each side is None before it starts, _PENDING while it runs, then its result tuple.
+    def passes(result):
+        return result is not None and result is not _PENDING and _passes_quality_gate(result[0], settings)
+
+    if passes(puppeteer):
+        return "done", "puppeteer"
+    if fallback is None:
+        return "start_fallback", None
+    if passes(fallback):
+        if puppeteer is _PENDING and not grace_spent:
+            return "grace", None
+        return "done", "fallback"
+    if puppeteer is not _PENDING and fallback is not _PENDING:
+        return "done", None
+    return "wait", None
+
+
+def _race_hedged(url: str, settings):
+    executor = _get_executor("hedge", settings)
+    start = time.time()
+    cancel_puppeteer = Event()
+    cancel_fallback = Event()
+    puppeteer = executor.submit(_try_puppeteer, url, settings, cancel_puppeteer)
+    fallback = None
+    fallback_started_ms = None
+    grace_spent = False
+
+    def state(future):
+        if future is None:
+            return None
+        return future.result() if future.done() else _PENDING
+
+    if settings.hedge_delay_ms > 0:
+        wait([puppeteer], timeout=settings.hedge_delay_ms / 1000)
+    while True:
+        action, winner = _hedge_step(settings, state(puppeteer), state(fallback), grace_spent)
+        if action == "done":
+            break
+        if action == "start_fallback":
+            fallback = executor.submit(_try_fallback, url, settings, cancel_fallback)
+            fallback_started_ms = (time.time() - start) * 1000
+        elif action == "grace":
+            wait([puppeteer], timeout=settings.hedge_grace_ms / 1000)
+            grace_spent = True
+        else:
+            wait([future for future in (puppeteer, fallback) if not future.done()], return_when=FIRST_COMPLETED)
+
+    puppeteer_cancelled = winner != "puppeteer" and not puppeteer.done()
+    if puppeteer_cancelled:
+        cancel_puppeteer.set()
+    requests_cancelled = winner == "puppeteer" and fallback is not None and not fallback.done()
+    if requests_cancelled:
+        cancel_fallback.set()
+    return (
+        (time.time() - start) * 1000,
+        puppeteer.result() if puppeteer.done() else None,
+        fallback.result() if fallback is not None and fallback.done() else None,
+        winner,
+        fallback_started_ms,
+        puppeteer_cancelled,
+        requests_cancelled,
+    )
+
+
+def _hedge_outcome(
+    settings,
+    shed,
+    scrape_time_ms,
+    puppeteer_result,
+    fallback_result,
+    winner,
+    fallback_started_ms,
+    puppeteer_cancelled,
+    requests_cancelled,
+):
+    puppeteer_text, puppeteer_error, puppeteer_ms, puppeteer_validators = puppeteer_result or (None, None, None, {})
+    fallback_text, fallback_error, fallback_ms, fallback_validators = fallback_result or (None, None, None, {})
+
+    if winner is None:
+        # Neither result passed the gate: keep the sequential preference order.
+        if puppeteer_text is not None:
+            winner = "puppeteer"
+        elif fallback_text is not None:
+            winner = "fallback"
+
+    time_saved_ms = None
+    lower_bound = False
+    if puppeteer_cancelled and puppeteer_ms is None:
+        # Puppeteer started with the scrape and ran until now; it would have needed at least this long.
+        puppeteer_ms = scrape_time_ms
+        lower_bound = True
+    if winner == "puppeteer":
+        time_saved_ms = 0
+    elif winner == "fallback" and puppeteer_text is None and puppeteer_ms is not None:
+        time_saved_ms = max(0, round(puppeteer_ms + fallback_ms - scrape_time_ms))
+
+    details = {
+        "hedge": {
+            "winner": "Puppeteer" if winner == "puppeteer" else "Requests" if winner == "fallback" else None,
+            "puppeteer_ms": round(puppeteer_ms) if puppeteer_ms is not None else None,
+            "puppeteer_error": puppeteer_error,
+            "puppeteer_cancelled": puppeteer_cancelled,
+            "requests_started_ms": round(fallback_started_ms) if fallback_started_ms is not None else None,
+            "requests_ms": round(fallback_ms) if fallback_ms is not None else None,
+            "requests_cancelled": requests_cancelled,
+            "time_saved_ms": time_saved_ms,
+            "time_saved_lower_bound": lower_bound,
+        }
+    }
+
+    if winner is None:
+        _shed_overload(settings, puppeteer_error, shed)
+        return (None, "Requests", round(scrape_time_ms), False, fallback_error or puppeteer_error, details), {}
+    if winner == "fallback" and puppeteer_error == "puppeteer_overloaded":
+        _get_admission(settings).count("degraded")
+
+    text = puppeteer_text if winner == "puppeteer" else fallback_text
+    validators = puppeteer_validators if winner == "puppeteer" else fallback_validators
+    normalized, truncated = _normalize_text(text, settings.max_chars)
+    source = "Puppeteer" if winner == "puppeteer" else "Requests"
+    return (normalized, source, round(scrape_time_ms), truncated, None, details), validators
+
+
+def _shed_overload(settings, puppeteer_error, shed: bool):
+    if puppeteer_error != "puppeteer_overloaded":
+        return
+    admission = _get_admission(settings)
+    if shed:
+        admission.count("shed")
+        raise ScraperOverloaded(settings.scraper_retry_after)
+    admission.count("degraded")
+
+
+def _sequential_flow(url: str, settings, shed: bool):
+    text, error, scrape_time_ms, validators = yield _try_puppeteer, (url, settings)
+    _shed_overload(settings, error, shed)
+    if text is not None:
+        normalized, truncated = _normalize_text(text, settings.max_chars)
+        return (normalized, "Puppeteer", round(scrape_time_ms), truncated, None, {}), validators
+
+    fallback_text, error, scrape_time_ms, validators = yield _try_fallback, (url, settings)
+    if fallback_text is not None:
         normalized, truncated = _normalize_text(fallback_text, settings.max_chars)
-        scrape_time_ms = (time.time() - start) * 1000
-        return normalized, "Requests", round(scrape_time_ms), truncated, None
-    except requests.exceptions.Timeout:
-        error = "requests_timeout"
-    except requests.exceptions.RequestException:
-        error = "requests_error"
-    except Exception:
-        error = "requests_error"
+        return (normalized, "Requests", round(scrape_time_ms), truncated, None, {}), validators
+
+    return (None, "Requests", round(scrape_time_ms), False, error, {}), {}
+
+
+def _plan_route(url: str, settings):
+    router = _get_router(settings)
+    return router.plan(host_of(url)) if router is not None else None
+
 
-    logger.warning("Requests fallback failed: %s", error)
+def _requests_only_outcome(url: str, settings, fallback_result):
+    text, _, scrape_time_ms, validators = fallback_result
+    if not _passes_quality_gate(text, settings):
+        _get_router(settings).demote(host_of(url))
+        return None, {}
+    normalized, truncated = _normalize_text(text, settings.max_chars)
+    return (normalized, "Requests", round(scrape_time_ms), truncated, None, {}), validators
 
+
+def _observe_comparison(url: str, settings, puppeteer_result, fallback_result):
+    puppeteer_text, fallback_text = puppeteer_result[0], fallback_result[0]
+    # Only a page Puppeteer rendered properly says anything about whether the static HTML is enough.
+    if not _passes_quality_gate(puppeteer_text, settings):
+        return None
+    fallback_normalized = _normalize_text(fallback_text, settings.max_chars)[0] if fallback_text else ""
+    similarity = text_similarity(_normalize_text(puppeteer_text, settings.max_chars)[0], fallback_normalized)
+    _get_router(settings).observe(host_of(url), similarity)
+    return similarity
+
+
+def _compare_outcome(url: str, settings, shed, route, scrape_time_ms, puppeteer_result, fallback_result):
+    # A result still running is None here; it reaches the router from the background once it finishes.
+    if puppeteer_result is not None and fallback_result is not None:
+        similarity = _observe_comparison(url, settings, puppeteer_result, fallback_result)
+        if similarity is not None:
+            route["similarity"] = similarity
+    puppeteer_text, puppeteer_error, _, puppeteer_validators = puppeteer_result or (None, None, None, {})
+    fallback_text, fallback_error, _, fallback_validators = fallback_result or (None, None, None, {})
+    puppeteer_passes = _passes_quality_gate(puppeteer_text, settings)
+
+    if puppeteer_passes or (puppeteer_text is not None and not _passes_quality_gate(fallback_text, settings)):
+        text, source, validators = puppeteer_text, "Puppeteer", puppeteer_validators
+    elif fallback_text is not None:
+        if puppeteer_error == "puppeteer_overloaded":
+            _get_admission(settings).count("degraded")
+        text, source, validators = fallback_text, "Requests", fallback_validators
+    else:
+        _shed_overload(settings, puppeteer_error, shed)
+        return (None, "Requests", round(scrape_time_ms), False, fallback_error or puppeteer_error, {}), {}
+    normalized, truncated = _normalize_text(text, settings.max_chars)
+    return (normalized, source, round(scrape_time_ms), truncated, None, {}), validators
+
+
+def _scrape_both(url: str, settings):
+    executor = _get_executor("compare", settings)
+    start = time.time()
+    puppeteer = executor.submit(_try_puppeteer, url, settings)
+    fallback = executor.submit(_try_fallback, url, settings)
+    finished, pending = set(), {puppeteer, fallback}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        finished |= done
+        if any(_passes_quality_gate(future.result()[0], settings) for future in done):
+            break
     scrape_time_ms = (time.time() - start) * 1000
-    return None, "Requests", round(scrape_time_ms), False, error
+    if pending:
+        # The answer does not wait for the slower source; the comparison is finished once it lands.
+        pending.pop().add_done_callback(
+            lambda _: _observe_comparison(url, settings, puppeteer.result(), fallback.result())
+        )
+    return (
+        scrape_time_ms,
+        puppeteer.result() if puppeteer in finished else None,
+        fallback.result() if fallback in finished else None,
+    )
+
+
+def _with_routing(extraction, route):
+    text, source, scrape_time_ms, truncated, error, details = extraction
+    return text, source, scrape_time_ms, truncated, error, {**details, "routing": route}
+
+
+def _conditional_headers(entry: dict):
+    conditional = {}
+    if entry.get("etag"):
+        conditional["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        conditional["If-Modified-Since"] = entry["last_modified"]
+    return conditional
+
+
+def _lookup_validators(settings, url: str):
+    store = _get_validator_store(settings)
+    cached = store.get(url) if store is not None else None
+    return store, cached[0] if cached is not None else None
+
+
+def _not_modified_extraction(store, url: str, entry: dict, scrape_time_ms):
+    _count_revalidation("not_modified")
+    store.set(url, entry)
+    details = {"revalidated": True, "revalidated_by": "etag" if entry.get("etag") else "last_modified"}
+    return entry["text"], entry["source"], round(scrape_time_ms), entry["truncated"], None, details
+
+
+def _remember_extraction(store, url: str, entry, extraction, validators):
+    text, source, scrape_time_ms, truncated, error, details = extraction
+    if store is None or text is None:
+        return extraction
+
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    unchanged = entry is not None and entry.get("content_hash") == content_hash
+    if unchanged:
+        _count_revalidation("content_unchanged")
+    # Puppeteer's validators describe the raw document, not the rendered text, so a 304 cannot vouch for it.
+    if source != "Requests":
+        validators = {}
+    store.set(
+        url,
+        {
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "content_hash": content_hash,
+            "text": text,
+            "source": source,
+            "truncated": truncated,
+            "prediction": entry.get("prediction") if unchanged else None,
+        },
+    )
+    details = {**details, "revalidated": unchanged, "revalidated_by": "content_hash" if unchanged else None}
+    return text, source, scrape_time_ms, truncated, error, details
+
+
+def _validated_entry(store, url: str, text: str):
+    cached = store.get(url) if store is not None else None
+    if cached is None or cached[0].get("content_hash") != hashlib.sha256(text.encode("utf-8")).hexdigest():
+        return None
+    return cached[0]
+
+
+def get_stored_prediction(url: str, text: str):
+    entry = _validated_entry(_get_validator_store(load_settings()), url, text)
+    return entry.get("prediction") if entry is not None else None
+
+
+def store_prediction(url: str, text: str, prediction):
+    # A later 304 for this text reuses the prediction instead of running the model again.
+    store = _get_validator_store(load_settings())
+    entry = _validated_entry(store, url, text)
+    if entry is not None and (entry.get("etag") or entry.get("last_modified")):
+        store.set(url, {**entry, "prediction": list(prediction)})
+
+
+def _conditional_get(url: str, conditional: dict, settings):
+    return _try_fallback(url, settings, conditional=conditional)
+
+
+def _revalidation_flow(url: str, store, entry: dict, settings):
+    conditional = _conditional_headers(entry)
+    if entry.get("source") != "Requests" or not conditional:
+        return None
+
+    text, error, scrape_time_ms, validators = yield _conditional_get, (url, conditional, settings)
+    if error == "requests_circuit_open":
+        return None
+    _count_revalidation("conditional_requests")
+    if text is _NOT_MODIFIED:
+        return (yield _not_modified_extraction, (store, url, entry, scrape_time_ms))
+    if not _passes_quality_gate(text, settings):
+        return None
+    # The server sent the page itself, so keep that body instead of fetching it again.
+    normalized, truncated = _normalize_text(text, settings.max_chars)
+    extraction = (normalized, "Requests", round(scrape_time_ms), truncated, None, {"conditional": True})
+    return (yield _remember_extraction, (store, url, entry, extraction, validators))
+
+
+def _sheds_overload(settings, overload):
+    return (overload or settings.scraper_overload) == "reject"
+
+
+def _extraction_flow(url: str, settings, overload=None):
+    # Yields (step, args) for every scrape or storage call, so the sync and async extractors share one flow.
+    store, entry = yield _lookup_validators, (settings, url)
+    if entry is not None:
+        revalidated = yield from _revalidation_flow(url, store, entry, settings)
+        if revalidated is not None:
+            return revalidated
+
+    shed = _sheds_overload(settings, overload)
+    route = _plan_route(url, settings)
+    extraction = None
+    if route is not None and route["decision"] == "requests":
+        extraction, validators = _requests_only_outcome(url, settings, (yield _try_fallback, (url, settings)))
+        if extraction is None:
+            route = {**route, "decision": "default", "reason": "requests_failed"}
+    elif route is not None and route["decision"] == "compare":
+        scrape_time_ms, puppeteer_result, fallback_result = yield _scrape_both, (url, settings)
+        extraction, validators = _compare_outcome(
+            url, settings, shed, route, scrape_time_ms, puppeteer_result, fallback_result
+        )
+
+    if extraction is None:
+        if settings.hedge_enabled:
+            extraction, validators = _hedge_outcome(settings, shed, *(yield _race_hedged, (url, settings)))
+        else:
+            extraction, validators = yield from _sequential_flow(url, settings, shed)
+    if route is not None:
+        extraction = _with_routing(extraction, route)
+    return (yield _remember_extraction, (store, url, entry, extraction, validators))
+
+
+def _run_flow(flow):
+    result = None
+    while True:
+        try:
+            step, args = flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result = step(*args)
+
+
+def extract_text(url: str, overload=None):
+    return _run_flow(_extraction_flow(url, load_settings(), overload))
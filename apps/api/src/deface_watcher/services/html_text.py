@@ -0,0 +1,114 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+SKIPPED_TAGS = frozenset({"script", "style", "noscript"})
+_SNIFF_BYTES = 4096
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+_HEADER_CHARSET = re.compile(r"""charset\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
+
+class _TextCollector(HTMLParser):
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.done = False
+        self._max_chars = max_chars
+        self._skip_depth = 0
+        self._chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self.handle_data(data[len("CDATA[") :])
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        self.parts.append(data)
+        # Non-whitespace characters are a lower bound on the normalized length.
+        self._chars += sum(map(len, data.split()))
+        if self._max_chars and self._chars > self._max_chars:
+            self.done = True
+
+
+def _lookup_encoding(name):
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.decode("ascii") if isinstance(name, bytes) else name).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+
+
+def detect_encoding(head: bytes, content_type=None):
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    match = _META_CHARSET.search(head[:_SNIFF_BYTES])
+    encoding = _lookup_encoding(match.group(1)) if match else None
+    if encoding is None and content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        encoding = _lookup_encoding(match.group(1)) if match else None
+    return encoding or "utf-8"
+
+
+class HtmlTextStream:
+    def __init__(self, max_chars: int, max_bytes: int = 0, content_type=None):
+        self.received = 0
+        self._collector = _TextCollector(max_chars)
+        self._max_bytes = max_bytes
+        self._content_type = content_type
+        self._decoder = None
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> bool:
+        if not chunk:
+            return False
+        self.received += len(chunk)
+        if self._decoder is None:
+            self._pending += chunk
+            if len(self._pending) < _SNIFF_BYTES and not self._over_budget():
+                return False
+            self._start_decoder()
+            chunk, self._pending = self._pending, b""
+
+        self._collector.feed(self._decoder.decode(chunk))
+        return self._collector.done or self._over_budget()
+
+    def finish(self) -> str:
+        if not self._collector.done and not self._over_budget():
+            if self._decoder is None:
+                self._start_decoder()
+            self._collector.feed(self._decoder.decode(self._pending, final=True))
+            self._collector.close()
+        return "".join(self._collector.parts)
+
+    def _over_budget(self):
+        return bool(self._max_bytes) and self.received >= self._max_bytes
+
+    def _start_decoder(self):
+        encoding = detect_encoding(self._pending, self._content_type)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def extract_html_text(chunks, max_chars: int, max_bytes: int = 0, content_type=None, cancel=None):
+    stream = HtmlTextStream(max_chars, max_bytes=max_bytes, content_type=content_type)
+    for chunk in chunks:
+        if cancel is not None and cancel.is_set():
+            return None, stream.received
+        if stream.feed(chunk):
+            break
+    return stream.finish(), stream.received
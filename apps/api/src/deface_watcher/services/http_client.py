@@ -0,0 +1,180 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.poolmanager import PoolManager
+
+_LOCK = threading.Lock()
+_SESSIONS = {}
+_SESSIONS_PID = None
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"requests": 0, "connections_opened": 0, "dns_hits": 0, "dns_misses": 0}
+
+
+def _count(name: str):
+    with _STATS_LOCK:
+        _STATS[name] += 1
+
+
+class _DnsCache:
+    def __init__(self, ttl: float, max_entries: int = 4096):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def resolve(self, host: str, port: int):
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            _count("dns_hits")
+            return entry[0]
+
+        _count("dns_misses")
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+            self._entries[key] = (addresses, now + self._ttl)
+        return addresses
+
+    def forget(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _is_ip_literal(host: str):
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+class _CachedDnsConnection(HTTPConnection):
+    def __init__(self, *args, dns=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dns = dns
+
+    def _new_conn(self):
+        _count("connections_opened")
+        host = self._dns_host
+        if self._dns is None or not host or _is_ip_literal(host):
+            return super()._new_conn()
+
+        try:
+            addresses = self._dns.resolve(host, self.port)
+        except socket.gaierror as exc:
+            raise NameResolutionError(self.host, self, exc) from exc
+        error = None
+        try:
+            for ip in addresses:
+                # Only the socket goes to the cached address; Host, SNI and certificate checks keep the name.
+                self._dns_host = ip
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as exc:
+                    error = exc
+        finally:
+            self._dns_host = host
+        self._dns.forget(host, self.port)
+        raise error if error is not None else NewConnectionError(self, f"No addresses for {host}")
+
+
+class _CachedDnsHTTPSConnection(_CachedDnsConnection, HTTPSConnection):
+    pass
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDnsConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDnsHTTPSConnection
+
+
+class _PoolManager(PoolManager):
+    def __init__(self, dns, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+        self._dns = dns
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.conn_kw["dns"] = self._dns
+        return pool
+
+
+class _CachedDnsAdapter(HTTPAdapter):
+    def __init__(self, dns, **kwargs):
+        self._dns = dns
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _PoolManager(self._dns, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+
+class _Session(requests.Session):
+    def __init__(self, dns=None):
+        super().__init__()
+        self.dns = dns
+
+    def send(self, request, **kwargs):
+        _count("requests")
+        return super().send(request, **kwargs)
+
+
+def get_session(pool_connections: int = 32, pool_maxsize: int = 32, dns_ttl: float = 300.0):
+    global _SESSIONS_PID
+    key = (pool_connections, pool_maxsize, dns_ttl)
+    session = _SESSIONS.get(key) if _SESSIONS_PID == os.getpid() else None
+    if session is not None:
+        return session
+
+    with _LOCK:
+        if _SESSIONS_PID != os.getpid():
+            _SESSIONS.clear()
+            _SESSIONS_PID = os.getpid()
+        session = _SESSIONS.get(key)
+        if session is None:
+            dns = _DnsCache(dns_ttl) if dns_ttl > 0 else None
+            session = _Session(dns)
+            # Shared across threads and unrelated URLs: never carry cookies from one fetch to the next.
+            # A redirect chain still keeps its own cookies, since requests collects them on the request's jar.
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = _CachedDnsAdapter(dns, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSIONS[key] = session
+        return session
+
+
+def get_http_stats():
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    requests_made = stats["requests"]
+    reused = max(0, requests_made - stats["connections_opened"])
+    dns_lookups = stats["dns_hits"] + stats["dns_misses"]
+    stats["connections_reused"] = reused
+    stats["reuse_ratio"] = round(reused / requests_made, 4) if requests_made else None
+    stats["dns_hit_ratio"] = round(stats["dns_hits"] / dns_lookups, 4) if dns_lookups else None
+    stats["dns_entries"] = sum(len(session.dns) for session in list(_SESSIONS.values()) if session.dns is not None)
+    return stats
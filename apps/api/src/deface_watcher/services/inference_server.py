@@ -0,0 +1,204 @@
+import logging
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from ..config import configure_logging, load_settings
+from .artifacts import get_artifacts, start_watcher, warm_up
+from .batcher import MicroBatcher
+
+# Request: rows, cols, then rows * cols little-endian int32 tokens. rows == 0 is a ping.
+# Response: status, version, rows, cols, then rows * cols little-endian float32 (status 0)
+# or `rows` bytes of UTF-8 error message (status 1).
+_REQUEST = struct.Struct("<II")
+_RESPONSE = struct.Struct("<B16sII")
+_STATUS_OK = 0
+_STATUS_ERROR = 1
+_MAX_ROWS = 4096
+
+
+def _recv_exact(sock, size: int):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("inference socket closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                rows, cols = _REQUEST.unpack(_recv_exact(self.request, _REQUEST.size))
+                if rows > _MAX_ROWS:
+                    raise ConnectionError(f"frame too large: {rows} rows")
+                if rows and cols != self.server.max_length:
+                    break
+                payload = _recv_exact(self.request, rows * cols * 4)
+            except ConnectionError:
+                return
+            self.request.sendall(self.server.answer(rows, cols, payload))
+        # The payload is still unread, so answer and drop the connection instead of parsing it as the next header.
+        self.request.sendall(self.server.error(f"expected {self.server.max_length} columns, got {cols}"))
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, max_batch_size: int, max_wait_ms: float, max_length: int):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+        self.batcher = MicroBatcher(lambda rows, infer: infer(rows), max_batch_size, max_wait_ms)
+        self.max_length = max_length
+
+    def error(self, message: str):
+        encoded = message.encode("utf-8")
+        return _RESPONSE.pack(_STATUS_ERROR, get_artifacts()[3].encode("ascii"), len(encoded), 0) + encoded
+
+    def answer(self, rows: int, cols: int, payload: bytes):
+        _, _, infer, version = get_artifacts()
+        if rows == 0:
+            return _RESPONSE.pack(_STATUS_OK, version.encode("ascii"), 0, 0)
+        try:
+            processed = np.frombuffer(payload, dtype="<i4").reshape(rows, cols)
+            output = np.ascontiguousarray(self.batcher.submit(processed, infer), dtype="<f4")
+        except Exception as exc:
+            logging.getLogger(__name__).exception("Sidecar inference failed (rows=%s).", rows)
+            return self.error(f"{type(exc).__name__}: {exc}")
+        return _RESPONSE.pack(_STATUS_OK, version.encode("ascii"), *output.shape) + output.tobytes()
+
+
+class InferenceClient:
+    def __init__(self, path: str, timeout: float, retry: float):
+        self._path = path
+        self._timeout = timeout
+        self._retry = retry
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._seen_at = 0.0
+        self.version = None
+        self._stats = {"requests": 0, "rows": 0, "errors": 0, "skipped": 0, "connects": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _connect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None and self._local.pid == os.getpid():
+            return sock
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(self._path)
+        except OSError:
+            sock.close()
+            raise
+        self._local.sock = sock
+        self._local.pid = os.getpid()
+        self._count("connects")
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _call(self, tokens):
+        sock = self._connect()
+        sock.sendall(_REQUEST.pack(*tokens.shape) + tokens.tobytes())
+        status, version, rows, cols = _RESPONSE.unpack(_recv_exact(sock, _RESPONSE.size))
+        payload = _recv_exact(sock, rows * cols * 4 if status == _STATUS_OK else rows)
+        self.version = version.decode("ascii")
+        self._seen_at = time.monotonic()
+        if status != _STATUS_OK:
+            raise RuntimeError(payload.decode("utf-8", "replace"))
+        return np.frombuffer(payload, dtype="<f4").reshape(rows, cols), self.version
+
+    def _guarded(self, tokens):
+        if time.monotonic() < self._down_until:
+            self._count("skipped")
+            return None, None
+        try:
+            output, version = self._call(tokens)
+        except (OSError, RuntimeError) as exc:
+            self._drop()
+            self._down_until = time.monotonic() + self._retry
+            self._count("errors")
+            logging.getLogger(__name__).warning("Inference sidecar unavailable, using in-process model: %s", exc)
+            return None, None
+        self._count("requests")
+        self._count("rows", len(tokens))
+        # The version comes from this very response, so it always names the model that scored these rows.
+        return output, version
+
+    def infer(self, processed):
+        processed = np.asarray(processed)
+        return self._guarded(np.ascontiguousarray(processed, dtype="<i4").reshape(processed.shape[0], -1))
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    @property
+    def age(self):
+        return time.monotonic() - self._seen_at
+
+    def ping(self):
+        try:
+            self._call(np.zeros((0, 0), dtype="<i4"))
+        except (OSError, RuntimeError):
+            self._drop()
+            return False
+        self._down_until = 0.0
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"path": self._path, "version": self.version, "available": self.available, **self._stats}
+
+
+def serve(path=None):
+    settings = load_settings()
+    configure_logging(settings.log_level)
+    logger = logging.getLogger(__name__)
+    path = path or settings.inference_socket
+    if not path:
+        raise SystemExit("INFERENCE_SOCKET is not set")
+
+    start = time.time()
+    get_artifacts()
+    warm_up(settings.warmup_batch_sizes)
+    start_watcher(settings.model_watch_interval)
+    server = InferenceServer(path, settings.microbatch_max_size, settings.microbatch_max_wait_ms, settings.max_length)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    logger.info(
+        "Inference sidecar listening on %s (pid=%s, version=%s, ready in %.0f ms).",
+        path,
+        os.getpid(),
+        get_artifacts()[3],
+        (time.time() - start) * 1000,
+    )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+_PRUNE_EVERY = 200
+_FINISHED = ("done", "failed")
+
+
+class JobQueue:
+    def __init__(self, path, lease_seconds: float, max_attempts: int, retention: float):
+        self._path = str(path)
+        self._lease_seconds = float(lease_seconds)
+        self._max_attempts = max(1, int(max_attempts))
+        self._retention = float(retention)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = 0
+        self.changed = threading.Condition()
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, url TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "lease_until REAL, worker TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def enqueue(self, urls):
+        now = time.time()
+        rows = [(uuid.uuid4().hex, url, "queued", now) for url in urls]
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT INTO jobs (id, url, status, created_at) VALUES (?, ?, ?, ?)", rows)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._notify()
+        return [row[0] for row in rows]
+
+    def claim(self, worker: str):
+        now = time.time()
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases left behind by a crashed or restarted worker go back to the queue, or fail for good.
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease_expired', finished_at = ?, lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self._max_attempts),
+            )
+            requeued = connection.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, worker = NULL "
+                "WHERE status = 'running' AND lease_until < ?",
+                (now,),
+            ).rowcount
+            row = connection.execute(
+                "SELECT id, url, attempts FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                    "lease_until = ?, worker = ? WHERE id = ?",
+                    (now, now + self._lease_seconds, worker, row[0]),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None, requeued
+        return {"id": row[0], "url": row[1], "attempts": row[2] + 1}, requeued
+
+    def finish(self, job_id: str, worker: str, status: str, result=None, error=None):
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, now, job_id, worker),
+        )
+        with self._lock:
+            self._finished += 1
+            prune = self._finished % _PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+        self._notify()
+
+    @property
+    def lease_seconds(self):
+        return self._lease_seconds
+
+    def renew(self, leases: dict):
+        lease_until = time.time() + self._lease_seconds
+        self._connect().executemany(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            [(lease_until, job_id, worker) for job_id, worker in leases.items()],
+        )
+
+    def release(self, job_id: str, worker: str, error: str):
+        connection = self._connect()
+        connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, error = ?, "
+            "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END, lease_until = NULL, worker = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (self._max_attempts, error, self._max_attempts, time.time(), job_id, worker),
+        )
+        self._notify()
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT id, url, status, attempts, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, url, status, attempts, result, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "url": url,
+            "status": status,
+            "attempts": attempts,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def wait(self, job_id: str, timeout: float, poll: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in _FINISHED or remaining <= 0:
+                return job
+            # Jobs finished by another process only show up on the next poll.
+            with self.changed:
+                self.changed.wait(min(poll, remaining))
+
+    def counts(self):
+        try:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        except sqlite3.Error:
+            logging.getLogger(__name__).warning("Job queue count failed (%s).", self._path, exc_info=True)
+            return None
+        return {status: count for status, count in rows}
+
+    def _notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def _prune(self):
+        if self._retention <= 0:
+            return
+        try:
+            self._connect().execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self._retention,),
+            )
+        except sqlite3.Error:
+            logging.getLogger(__name__).warning("Job queue prune failed (%s).", self._path, exc_info=True)
+
+
+class JobRunner:
+    def __init__(self, queue: JobQueue, handler, workers: int, poll: float):
+        self._queue = queue
+        self._handler = handler
+        self._workers = max(1, int(workers))
+        self._poll = poll
+        self._lock = threading.Lock()
+        self._stats = {"processed": 0, "failed": 0, "retried": 0, "requeued": 0, "busy": 0}
+        self._threads = []
+        self._active = {}
+
+    def start(self):
+        for index in range(self._workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+        return self
+
+    def _heartbeat(self):
+        # A scrape may outlast one lease; renewing keeps it from being handed to a second worker mid-run.
+        interval = max(0.5, self._queue.lease_seconds / 3)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            try:
+                self._queue.renew(active)
+            except sqlite3.Error:
+                logging.getLogger(__name__).warning("Job lease renewal failed.", exc_info=True)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _loop(self):
+        logger = logging.getLogger(__name__)
+        worker = f"{os.getpid()}:{threading.get_ident()}"
+        while True:
+            try:
+                job, requeued = self._queue.claim(worker)
+            except sqlite3.Error:
+                logger.warning("Job claim failed.", exc_info=True)
+                job, requeued = None, 0
+            if requeued:
+                self._count("requeued", requeued)
+            if job is None:
+                with self._queue.changed:
+                    self._queue.changed.wait(self._poll)
+                continue
+
+            self._count("busy")
+            with self._lock:
+                self._active[job["id"]] = worker
+            try:
+                status, result = self._handler(job["url"])
+                self._queue.finish(job["id"], worker, status, result=result)
+                self._count("processed")
+                if status != "done":
+                    self._count("failed")
+            except Exception:
+                logger.exception("Job %s failed on attempt %s", job["id"], job["attempts"])
+                self._count("retried")
+                try:
+                    self._queue.release(job["id"], worker, "worker_error")
+                except sqlite3.Error:
+                    logger.warning("Job release failed.", exc_info=True)
+            finally:
+                with self._lock:
+                    self._active.pop(job["id"], None)
+                self._count("busy", -1)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["workers"] = len(self._threads)
+        stats["queue"] = self._queue.counts()
+        return stats
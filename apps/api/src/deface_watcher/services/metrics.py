@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+_ARCHIVE = "archive.json"
+
+METRICS = {
+    "deface_scrape_duration_seconds": ("histogram", "Time spent scraping a URL, by source."),
+    "deface_tokenize_duration_seconds": ("histogram", "Time spent tokenizing texts for one prediction call."),
+    "deface_inference_duration_seconds": ("histogram", "Time spent in model inference, including batching and sidecar."),
+    "deface_request_duration_seconds": ("histogram", "Total time to answer a prediction, by cache hit."),
+    "deface_scrape_errors_total": ("counter", "Scrapes that produced no text, by scrape_error code."),
+    "deface_scrape_fallbacks_total": ("counter", "Scrapes answered by the requests fallback after Puppeteer was tried."),
+    "deface_cache_requests_total": ("counter", "Cache lookups, by cache and result."),
+    "deface_scrapes_in_flight": ("gauge", "Scrapes currently running."),
+}
+
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_GAUGES = {}
+_HISTOGRAMS = {}
+_ENABLED = True
+_DIRECTORY = None
+_FLUSHER_PID = None
+
+
+def _key(name: str, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not _ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+
+
+def gauge_add(name: str, amount: float, **labels):
+    if not _ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _GAUGES[key] = _GAUGES.get(key, 0) + amount
+
+
+def observe(name: str, seconds: float, **labels):
+    if not _ENABLED:
+        return
+    key = _key(name, labels)
+    index = bisect_left(_BUCKETS, seconds)
+    with _LOCK:
+        histogram = _HISTOGRAMS.get(key)
+        if histogram is None:
+            histogram = _HISTOGRAMS[key] = [[0] * (len(_BUCKETS) + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+@contextmanager
+def in_flight(name: str, **labels):
+    gauge_add(name, 1, **labels)
+    try:
+        yield
+    finally:
+        gauge_add(name, -1, **labels)
+
+
+def _snapshot():
+    started = _process_start(os.getpid())
+    with _LOCK:
+        return {
+            "pid": os.getpid(),
+            "started": started,
+            "counters": [[name, labels, value] for (name, labels), value in _COUNTERS.items()],
+            "gauges": [[name, labels, value] for (name, labels), value in _GAUGES.items()],
+            "histograms": [[name, labels, list(h[0]), h[1], h[2]] for (name, labels), h in _HISTOGRAMS.items()],
+        }
+
+
+def _write(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    os.replace(tmp_path, path)
+
+
+def _read(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def flush():
+    if _DIRECTORY is None:
+        return
+    _write(os.path.join(_DIRECTORY, f"{os.getpid()}.json"), _snapshot())
+
+
+def _merge(into, data, gauges: bool):
+    for name, labels, value in data["counters"]:
+        key = _key(name, dict(labels))
+        into["counters"][key] = into["counters"].get(key, 0) + value
+    if gauges:
+        for name, labels, value in data["gauges"]:
+            key = _key(name, dict(labels))
+            into["gauges"][key] = into["gauges"].get(key, 0) + value
+    for name, labels, buckets, total, count in data["histograms"]:
+        key = _key(name, dict(labels))
+        histogram = into["histograms"].setdefault(key, [[0] * (len(_BUCKETS) + 1), 0.0, 0])
+        histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+        histogram[1] += total
+        histogram[2] += count
+
+
+def _process_start(pid: int):
+    # Start time in clock ticks since boot (field 22 of /proc/<pid>/stat): a reused pid never matches it.
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as handle:
+            stat = handle.read()
+    except OSError:
+        return None
+    return int(stat[stat.rindex(b")") + 2 :].split()[19])
+
+
+def _alive(pid: int, started=None):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return started is None or _process_start(pid) in (None, started)
+
+
+def _empty():
+    return {"counters": {}, "gauges": {}, "histograms": {}}
+
+
+def _as_file(merged):
+    return {
+        "pid": None,
+        "counters": [[name, list(labels), value] for (name, labels), value in merged["counters"].items()],
+        "gauges": [],
+        "histograms": [[name, list(labels), h[0], h[1], h[2]] for (name, labels), h in merged["histograms"].items()],
+    }
+
+
+def _collect_shared(directory: str):
+    merged = _empty()
+    lock_handle = open(os.path.join(directory, ".lock"), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_handle, fcntl.LOCK_EX)
+        archive_path = os.path.join(directory, _ARCHIVE)
+        archive = _empty()
+        archived = _read(archive_path)
+        if archived is not None:
+            _merge(archive, archived, gauges=False)
+        dead = []
+        for name in os.listdir(directory):
+            if not name.endswith(".json") or name == _ARCHIVE or not name[:-5].isdigit():
+                continue
+            data = _read(os.path.join(directory, name))
+            if data is None:
+                continue
+            if _alive(int(name[:-5]), data.get("started")):
+                _merge(merged, data, gauges=True)
+            else:
+                # Counters of a worker that exited must not go backwards, so fold them into the archive.
+                _merge(archive, data, gauges=False)
+                dead.append(name)
+        if dead:
+            _write(archive_path, _as_file(archive))
+            for name in dead:
+                os.unlink(os.path.join(directory, name))
+        _merge(merged, _as_file(archive), gauges=False)
+    finally:
+        lock_handle.close()
+    return merged
+
+
+def collect():
+    if _DIRECTORY is None:
+        merged = _empty()
+        _merge(merged, _snapshot(), gauges=True)
+        return merged
+    flush()
+    return _collect_shared(_DIRECTORY)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    merged = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), (buckets, total, count) in sorted(merged["histograms"].items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(_BUCKETS, buckets):
+                    cumulative += bucket
+                    lines.append(f"{name}_bucket{_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        else:
+            values = merged["counters"] if kind == "counter" else merged["gauges"]
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_directory(directory):
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith((".json", ".tmp")):
+            os.unlink(os.path.join(directory, name))
+
+
+def _flush_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except OSError:
+            logging.getLogger(__name__).warning("Flushing metrics failed.", exc_info=True)
+
+
+def configure(enabled: bool, directory, flush_interval: float):
+    global _ENABLED, _DIRECTORY, _FLUSHER_PID
+    _ENABLED = enabled
+    if not enabled or not directory or flush_interval <= 0 or _FLUSHER_PID == os.getpid():
+        return
+    with _LOCK:
+        if _FLUSHER_PID == os.getpid():
+            return
+        _FLUSHER_PID = os.getpid()
+        # Counts inherited from a preloading parent belong to the parent.
+        _COUNTERS.clear()
+        _GAUGES.clear()
+        _HISTOGRAMS.clear()
+    os.makedirs(directory, exist_ok=True)
+    _DIRECTORY = str(directory)
+    threading.Thread(target=_flush_loop, args=(flush_interval,), name="metrics-flusher", daemon=True).start()
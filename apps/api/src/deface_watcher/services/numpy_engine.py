@@ -0,0 +1,68 @@
+import numpy as np
+
+WEIGHT_KEYS = (
+    "embedding",
+    "forward_kernel",
+    "forward_recurrent_kernel",
+    "forward_bias",
+    "backward_kernel",
+    "backward_recurrent_kernel",
+    "backward_bias",
+    "dense_kernel",
+    "dense_bias",
+)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _run_lstm(inputs, kernel, recurrent_kernel, bias, reverse: bool):
+    batch_size, steps, _ = inputs.shape
+    units = recurrent_kernel.shape[0]
+    projected = inputs @ kernel + bias
+
+    hidden = np.zeros((batch_size, units), dtype=np.float32)
+    cell = np.zeros((batch_size, units), dtype=np.float32)
+    order = range(steps - 1, -1, -1) if reverse else range(steps)
+    for step in order:
+        z = projected[:, step] + hidden @ recurrent_kernel
+        input_gate = _sigmoid(z[:, :units])
+        forget_gate = _sigmoid(z[:, units : 2 * units])
+        candidate = np.tanh(z[:, 2 * units : 3 * units])
+        output_gate = _sigmoid(z[:, 3 * units :])
+        cell = forget_gate * cell + input_gate * candidate
+        hidden = output_gate * np.tanh(cell)
+    return hidden
+
+
+class NumpyBiLSTM:
+    def __init__(self, weights):
+        missing = [key for key in WEIGHT_KEYS if key not in weights]
+        if missing:
+            raise ValueError(f"Missing weights: {missing}")
+        for key in WEIGHT_KEYS:
+            setattr(self, key, np.ascontiguousarray(weights[key], dtype=np.float32))
+        self.vocab_size = int(self.embedding.shape[0])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def predict(self, tokens):
+        tokens = np.asarray(tokens)
+        if tokens.ndim != 2:
+            raise ValueError(f"Expected (N, max_length) tokens, got shape {tokens.shape}")
+
+        embedded = self.embedding[tokens]
+        forward = _run_lstm(
+            embedded, self.forward_kernel, self.forward_recurrent_kernel, self.forward_bias, reverse=False
+        )
+        backward = _run_lstm(
+            embedded, self.backward_kernel, self.backward_recurrent_kernel, self.backward_bias, reverse=True
+        )
+        logits = np.concatenate([forward, backward], axis=1) @ self.dense_kernel + self.dense_bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
@@ -1,34 +1,255 @@
+import hashlib
 import logging
 import time
+from threading import Lock
 
 import numpy as np
 
 from ..config import load_settings
-from .artifacts import get_artifacts
-from .preprocess import preprocess_text
+from . import metrics
+from .artifacts import get_artifacts, get_loaded_version, load_versioned_tokenizer
+from .batcher import MicroBatcher
+from .cache import LRUCache, SqliteCache, TieredCache
+from .inference_server import InferenceClient
+from .preprocess import preprocess_texts
 
+_BATCHER_LOCK = Lock()
+_BATCHER = None
+_MEMO_LOCK = Lock()
+_MEMO = None
+_SIDECAR_LOCK = Lock()
+_SIDECAR = None
 
-def predict_text(text: str):
+
+class _SidecarMiss(Exception):
+    def __init__(self, version):
+        super().__init__(version)
+        self.version = version
+
+
+def _run_model(processed, infer):
+    return infer(processed)
+
+
+def _get_batcher(settings):
+    global _BATCHER
+    if not settings.microbatch_enabled:
+        return None
+    if _BATCHER is not None:
+        return _BATCHER
+
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = MicroBatcher(
+                _run_model,
+                max_batch_size=settings.microbatch_max_size,
+                max_wait_ms=settings.microbatch_max_wait_ms,
+            )
+        return _BATCHER
+
+
+def get_sidecar(settings):
+    global _SIDECAR
+    if not settings.inference_socket:
+        return None
+    if _SIDECAR is not None:
+        return _SIDECAR
+
+    with _SIDECAR_LOCK:
+        if _SIDECAR is None:
+            _SIDECAR = InferenceClient(
+                settings.inference_socket,
+                timeout=settings.inference_socket_timeout_ms / 1000,
+                retry=settings.inference_sidecar_retry,
+            )
+        return _SIDECAR
+
+
+def _refresh_sidecar_version(settings, sidecar):
+    # Memo hits never reach the sidecar, so ask for its version at least as often as it looks for new files.
+    if settings.model_watch_interval > 0 and sidecar.age > settings.model_watch_interval:
+        sidecar.ping()
+
+
+def get_current_version():
     settings = load_settings()
-    model, tokenizer = get_artifacts()
+    sidecar = get_sidecar(settings)
+    if sidecar is not None and sidecar.available:
+        _refresh_sidecar_version(settings, sidecar)
+        if sidecar.version is not None:
+            return sidecar.version
+    return get_loaded_version()
 
-    text_to_tokenize = text if isinstance(text, str) else ""
-    processed = preprocess_text(text_to_tokenize, tokenizer, settings.max_length)
-    tokenized_sequence = processed[0].tolist()
 
-    if not text_to_tokenize:
-        if settings.strict_empty_text:
-            return "Không đủ dữ liệu", 0.0, tokenized_sequence, 0
-        return "Bình thường", 0.0, tokenized_sequence, 0
+def _snapshot(settings, stale_version=None):
+    sidecar = get_sidecar(settings)
+    if sidecar is None or not sidecar.available:
+        return get_artifacts()
+    _refresh_sidecar_version(settings, sidecar)
+    tokenizer, version = load_versioned_tokenizer(stale_version)
+    if sidecar.version not in (None, version):
+        tokenizer, version = load_versioned_tokenizer(version)
+    return sidecar, tokenizer, None, version
+
+
+def _resync(settings, artifacts, served_version):
+    if served_version is not None:
+        # The sidecar swapped models: pick up the matching tokenizer if the files on disk are that version.
+        refreshed = _snapshot(settings, stale_version=artifacts[3])
+        if refreshed[3] == served_version:
+            return refreshed
+        logging.getLogger(__name__).warning(
+            "Sidecar serves version %s but the files on disk are %s, using in-process model.",
+            served_version,
+            refreshed[3],
+        )
+    return get_artifacts()
+
+
+def _infer(settings, processed, artifacts):
+    model, _, infer, version = artifacts
+    start = time.perf_counter()
+    batcher = _get_batcher(settings)
+    if isinstance(model, InferenceClient):
+        # The sidecar batches across all workers already; a second queue here would only add latency.
+        output, served_version = model.infer(processed)
+        if output is None or served_version != version:
+            raise _SidecarMiss(served_version)
+    elif batcher is None:
+        output = _run_model(processed, infer)
+    else:
+        output = batcher.submit(processed, infer)
+    metrics.observe("deface_inference_duration_seconds", time.perf_counter() - start)
+    return output
+
+
+def _get_memo(settings):
+    global _MEMO
+    if settings.predict_memo_size <= 0:
+        return None
+    if _MEMO is not None:
+        return _MEMO
+
+    with _MEMO_LOCK:
+        if _MEMO is None:
+            shared = None
+            if settings.predict_memo_db:
+                shared = SqliteCache(
+                    settings.predict_memo_db,
+                    ttl=0,
+                    max_entries=settings.predict_memo_db_max_entries,
+                    table="predictions",
+                )
+            _MEMO = TieredCache(LRUCache(settings.predict_memo_size, ttl=0), shared=shared)
+        return _MEMO
 
-    logger = logging.getLogger(__name__)
-    start = time.time()
-    prediction = model.predict(processed, verbose=0)
-    predict_time_ms = (time.time() - start) * 1000
 
-    probability = float(prediction[0][1])
-    predicted_class_index = int(np.argmax(prediction, axis=1)[0])
+def _memo_key(version, row):
+    return f"{version}:{hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()}"
+
+
+def get_predictor_stats():
+    settings = load_settings()
+    batcher = _get_batcher(settings)
+    memo = _get_memo(settings)
+    sidecar = get_sidecar(settings)
+    return {
+        "sidecar": sidecar.stats() if sidecar is not None else None,
+        "microbatch_enabled": settings.microbatch_enabled,
+        "microbatch": batcher.stats() if batcher is not None else None,
+        "memo": memo.stats() if memo is not None else None,
+    }
+
+
+def _classify(row):
+    probability = float(row[1])
+    predicted_class_index = int(np.argmax(row))
     status = "Tấn công Deface" if predicted_class_index == 1 else "Bình thường"
-    logger.debug("Prediction done: status=%s prob=%.4f", status, probability)
+    return status, probability
+
+
+def _predict_rows(settings, artifacts, processed, rows):
+    version = artifacts[3]
+    memo = _get_memo(settings)
+    if memo is None:
+        return dict(zip(rows, (_classify(row) for row in _infer(settings, processed[rows], artifacts))))
+
+    predictions = {}
+    pending = {}
+    for index in rows:
+        key = _memo_key(version, processed[index])
+        if key in pending:
+            pending[key].append(index)
+            continue
+        entry = memo.get(key)
+        metrics.inc("deface_cache_requests_total", cache="predict_memo", result="miss" if entry is None else "hit")
+        if entry is not None:
+            predictions[index] = tuple(entry[0])
+        else:
+            pending[key] = [index]
+
+    if pending:
+        keys = list(pending)
+        outputs = _infer(settings, processed[[pending[key][0] for key in keys]], artifacts)
+        for key, row in zip(keys, outputs):
+            result = _classify(row)
+            memo.set(key, list(result))
+            for index in pending[key]:
+                predictions[index] = result
+    return predictions
+
+
+def _empty_result(settings, tokenized_sequence, version):
+    if settings.strict_empty_text:
+        return "Không đủ dữ liệu", 0.0, tokenized_sequence, 0, version
+    return "Bình thường", 0.0, tokenized_sequence, 0, version
 
-    return status, probability, tokenized_sequence, round(predict_time_ms)
+
+def _predict_with(settings, artifacts, texts_to_tokenize):
+    _, tokenizer, _, version = artifacts
+    start = time.perf_counter()
+    processed = preprocess_texts(texts_to_tokenize, tokenizer, settings.max_length)
+    metrics.observe("deface_tokenize_duration_seconds", time.perf_counter() - start)
+
+    logger = logging.getLogger(__name__)
+    rows = [index for index, text in enumerate(texts_to_tokenize) if text]
+    predictions = {}
+    predict_time_ms = 0
+    if rows:
+        start = time.time()
+        predictions = _predict_rows(settings, artifacts, processed, rows)
+        predict_time_ms = round((time.time() - start) * 1000)
+
+    results = []
+    for index in range(len(texts_to_tokenize)):
+        tokenized_sequence = processed[index].tolist()
+        if index not in predictions:
+            results.append(_empty_result(settings, tokenized_sequence, version))
+            continue
+        status, probability = predictions[index]
+        logger.debug("Prediction done: status=%s prob=%.4f", status, probability)
+        results.append((status, probability, tokenized_sequence, predict_time_ms, version))
+    return results
+
+
+def predict_texts(texts):
+    texts_to_tokenize = [text if isinstance(text, str) else "" for text in texts]
+    if not texts_to_tokenize:
+        return []
+
+    settings = load_settings()
+    # One snapshot per call: a hot swap mid-request must not mix one version's tokenizer with another's model.
+    artifacts = _snapshot(settings)
+    try:
+        return _predict_with(settings, artifacts, texts_to_tokenize)
+    except _SidecarMiss as exc:
+        artifacts = _resync(settings, artifacts, exc.version)
+    try:
+        return _predict_with(settings, artifacts, texts_to_tokenize)
+    except _SidecarMiss:
+        # Swapped again in between; the in-process model is consistent by construction.
+        return _predict_with(settings, get_artifacts(), texts_to_tokenize)
+
+
+def predict_text(text: str):
+    return predict_texts([text])[0]
@@ -1,6 +1,6 @@
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+def preprocess_texts(texts, tokenizer, max_length: int):
+    return tokenizer.encode_batch(texts, max_length)
 
 
 def preprocess_text(text, tokenizer, max_length: int):
-    sequence = tokenizer.texts_to_sequences([text])
-    return pad_sequences(sequence, maxlen=max_length, padding="post", truncating="post")
+    return tokenizer.encode(text, max_length)
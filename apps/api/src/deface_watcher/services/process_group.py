@@ -0,0 +1,223 @@
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+
+_POSIX = hasattr(os, "killpg")
+_PROC = "/proc"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_POLL_SECONDS = 0.05
+_USAGE_EVERY_SECONDS = 0.25
+_REAP_GRACE_SECONDS = 5
+
+_LOCK = threading.Lock()
+_GROUPS = {}
+_REAPER_PID = None
+_STATS = {
+    "spawned": 0,
+    "killed_timeout": 0,
+    "killed_cancelled": 0,
+    "killed_rss": 0,
+    "killed_cpu": 0,
+    "stragglers_killed": 0,
+    "reaped": 0,
+}
+
+
+def _count(name: str):
+    with _LOCK:
+        _STATS[name] += 1
+
+
+def record_kill(reason: str):
+    _count(f"killed_{reason.split('_')[0]}")
+
+
+def session_kwargs():
+    return {"start_new_session": True} if _POSIX else {}
+
+
+def register(pid: int, timeout=None):
+    with _LOCK:
+        _STATS["spawned"] += 1
+        _GROUPS[pid] = time.monotonic() + timeout + _REAP_GRACE_SECONDS if timeout is not None else None
+
+
+def unregister(pid: int):
+    with _LOCK:
+        _GROUPS.pop(pid, None)
+
+
+def kill_tree(process):
+    if not _POSIX:
+        try:
+            process.kill()
+        except (ProcessLookupError, OSError):
+            pass
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_stat(pid):
+    try:
+        with open(os.path.join(_PROC, str(pid), "stat"), "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return None
+    return data[data.rindex(b")") + 2 :].split()
+
+
+def _group_members(pgid: int):
+    try:
+        pids = [int(name) for name in os.listdir(_PROC) if name.isdigit()]
+    except OSError:
+        return None
+    members = []
+    for pid in pids:
+        fields = _read_stat(pid)
+        if fields is not None and int(fields[2]) == pgid and fields[0] not in (b"Z", b"X"):
+            members.append(fields)
+    return members
+
+
+def group_usage(pgid: int):
+    if not _POSIX or not os.path.isdir(_PROC):
+        return None
+    members = _group_members(pgid)
+    if members is None:
+        return None
+    rss = sum(int(fields[21]) for fields in members) * _PAGE_SIZE
+    cpu_ticks = sum(int(fields[11]) + int(fields[12]) for fields in members)
+    leader = _read_stat(pgid)
+    if leader is not None:
+        # Children the leader already waited for still count against the scrape.
+        cpu_ticks += int(leader[13]) + int(leader[14])
+    return rss, cpu_ticks / _CLOCK_TICKS
+
+
+def group_alive(pgid: int):
+    if not _POSIX or not os.path.isdir(_PROC):
+        return True
+    return bool(_group_members(pgid))
+
+
+def limit_exceeded(pgid: int, max_rss_mb: float, max_cpu_seconds: float):
+    if max_rss_mb <= 0 and max_cpu_seconds <= 0:
+        return None
+    usage = group_usage(pgid)
+    if usage is None:
+        return None
+    rss, cpu_seconds = usage
+    if max_rss_mb > 0 and rss > max_rss_mb * 1024 * 1024:
+        return "rss_limit"
+    if max_cpu_seconds > 0 and cpu_seconds > max_cpu_seconds:
+        return "cpu_limit"
+    return None
+
+
+def run_supervised(command, timeout: float, cancel=None, max_rss_mb: float = 0, max_cpu_seconds: float = 0, env=None):
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        env=env,
+        **session_kwargs(),
+    )
+    register(process.pid, timeout)
+    deadline = time.monotonic() + timeout
+    next_usage = time.monotonic() + _USAGE_EVERY_SECONDS
+    error = None
+    stragglers = False
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                stdout, stderr = process.communicate(timeout=max(0.0, min(remaining, _POLL_SECONDS)))
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if process.poll() is not None:
+                # The leader is gone but something in its group still holds the pipes open.
+                stragglers = True
+                kill_tree(process)
+            elif cancel is not None and cancel.is_set():
+                error = "cancelled"
+            elif time.monotonic() >= deadline:
+                error = "timeout"
+            elif time.monotonic() >= next_usage:
+                next_usage = time.monotonic() + _USAGE_EVERY_SECONDS
+                error = limit_exceeded(process.pid, max_rss_mb, max_cpu_seconds)
+
+            if error is not None:
+                record_kill(error)
+                kill_tree(process)
+                stdout, stderr = process.communicate()
+                break
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if _POSIX and group_alive(process.pid):
+            stragglers = stragglers or error is None
+            kill_tree(process)
+        if stragglers:
+            _count("stragglers_killed")
+        unregister(process.pid)
+    return process.returncode, stdout, stderr, error
+
+
+def _leader_gone(pgid: int):
+    fields = _read_stat(pgid)
+    return fields is None or fields[0] in (b"Z", b"X")
+
+
+def _reap():
+    now = time.monotonic()
+    with _LOCK:
+        groups = list(_GROUPS.items())
+    for pgid, deadline in groups:
+        expired = deadline is not None and now > deadline
+        if not expired and not _leader_gone(pgid):
+            continue
+        if group_alive(pgid):
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+                _count("reaped")
+                logging.getLogger(__name__).warning("Reaped scraper process group %s.", pgid)
+            except (ProcessLookupError, PermissionError):
+                pass
+        unregister(pgid)
+
+
+def _reaper_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            _reap()
+        except Exception:
+            logging.getLogger(__name__).warning("Scraper reaper failed.", exc_info=True)
+
+
+def start_reaper(interval: float):
+    global _REAPER_PID
+    if not _POSIX or interval <= 0 or not os.path.isdir(_PROC) or _REAPER_PID == os.getpid():
+        return
+    with _LOCK:
+        if _REAPER_PID == os.getpid():
+            return
+        _REAPER_PID = os.getpid()
+    threading.Thread(target=_reaper_loop, args=(interval,), name="scraper-reaper", daemon=True).start()
+
+
+def get_process_stats():
+    with _LOCK:
+        return {**_STATS, "tracked": len(_GROUPS)}
@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+from .process_group import kill_tree, register, session_kwargs, unregister
+
+_CANCEL_POLL_SECONDS = 0.05
+
+
+class _Waiter:
+    __slots__ = ("event", "message", "callback")
+
+    def __init__(self, callback=None):
+        self.event = threading.Event()
+        self.message = None
+        self.callback = callback
+
+    def resolve(self, message):
+        self.message = message
+        self.event.set()
+        if self.callback is not None:
+            try:
+                self.callback()
+            except RuntimeError:
+                pass
+
+
+class ScraperDaemonClient:
+    def __init__(self, command, env=None, start_timeout: float = 30.0):
+        self._command = list(command)
+        self._env = env
+        self._start_timeout = start_timeout
+        self._lock = threading.Lock()
+        self._process = None
+        self._pid = None
+        self._ready = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._starts = 0
+        self._crashes = 0
+        self._requests = 0
+        self._timeouts = 0
+
+    def _start(self):
+        logger = logging.getLogger(__name__)
+        process = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            env=self._env,
+            **session_kwargs(),
+        )
+        register(process.pid)
+        ready = threading.Event()
+        self._process = process
+        self._pid = os.getpid()
+        self._ready = ready
+        self._starts += 1
+        threading.Thread(
+            target=self._read_loop,
+            args=(process, ready),
+            name="scraper-daemon-reader",
+            daemon=True,
+        ).start()
+        logger.info("Scraper daemon started (pid=%s, child=%s).", os.getpid(), process.pid)
+        return process, ready
+
+    def _ensure_process(self):
+        process = self._process
+        if process is not None and process.poll() is None and self._pid == os.getpid():
+            return process, self._ready
+        return self._start()
+
+    def _read_loop(self, process, ready):
+        logger = logging.getLogger(__name__)
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Scraper daemon sent invalid line: %.200s", line)
+                continue
+            if message.get("event") == "ready":
+                ready.set()
+                continue
+            with self._lock:
+                waiter = self._pending.pop(str(message.get("id")), None)
+            if waiter is not None:
+                waiter.resolve(message)
+
+        process.wait()
+        # Browsers started by the daemon share its process group; do not leave them running without it.
+        kill_tree(process)
+        unregister(process.pid)
+        ready.set()
+        with self._lock:
+            if self._process is not process:
+                return
+            self._process = None
+            self._crashes += 1
+            pending, self._pending = self._pending, {}
+        logger.warning("Scraper daemon exited (code=%s), %s request(s) failed.", process.returncode, len(pending))
+        for waiter in pending.values():
+            waiter.resolve({"ok": False, "error": "scraper_daemon_crashed"})
+
+    def _send(self, process, message):
+        process.stdin.write(json.dumps(message) + "\n")
+        process.stdin.flush()
+
+    def _register(self, waiter):
+        with self._lock:
+            process, ready = self._ensure_process()
+            request_id = str(next(self._ids))
+            self._pending[request_id] = waiter
+            self._requests += 1
+        return process, ready, request_id
+
+    def _forget(self, request_id: str, timed_out: bool = False):
+        with self._lock:
+            self._pending.pop(request_id, None)
+            if timed_out:
+                self._timeouts += 1
+
+    def _submit(self, process, request_id: str, url: str, page_timeout_ms: int):
+        try:
+            self._send(process, {"id": request_id, "url": url, "timeoutMs": int(page_timeout_ms)})
+            return True
+        except (BrokenPipeError, OSError, ValueError):
+            self._forget(request_id)
+            return False
+
+    def _result(self, message):
+        if not message.get("ok"):
+            error = (message.get("error") or "unknown").splitlines()[0]
+            return None, f"puppeteer_failed:{error}", {}
+        validators = {"etag": message.get("etag"), "last_modified": message.get("lastModified")}
+        return message.get("text") or "", None, validators
+
+    def fetch(self, url: str, timeout: float, cancel=None, page_timeout_ms=None):
+        deadline = time.monotonic() + timeout
+        waiter = _Waiter()
+        process, ready, request_id = self._register(waiter)
+
+        ready.wait(max(0.0, min(self._start_timeout, deadline - time.monotonic())))
+        if not self._submit(process, request_id, url, page_timeout_ms or timeout * 1000):
+            return None, "puppeteer_failed:scraper_daemon_unavailable", {}
+
+        while cancel is not None and not waiter.event.is_set() and time.monotonic() < deadline:
+            if cancel.is_set():
+                self._forget(request_id)
+                self.cancel(process, request_id)
+                return None, "puppeteer_cancelled", {}
+            waiter.event.wait(min(_CANCEL_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+        if not waiter.event.wait(max(0.0, deadline - time.monotonic())):
+            self._forget(request_id, timed_out=True)
+            self.cancel(process, request_id)
+            return None, "puppeteer_timeout", {}
+        return self._result(waiter.message)
+
+    async def fetch_async(self, url: str, timeout: float, page_timeout_ms=None):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        done = asyncio.Event()
+        waiter = _Waiter(callback=lambda: loop.call_soon_threadsafe(done.set))
+        process, ready, request_id = self._register(waiter)
+
+        startup_deadline = loop.time() + max(0.0, min(self._start_timeout, deadline - loop.time()))
+        while not ready.is_set() and loop.time() < startup_deadline:
+            await asyncio.sleep(_CANCEL_POLL_SECONDS)
+        if not self._submit(process, request_id, url, page_timeout_ms or timeout * 1000):
+            return None, "puppeteer_failed:scraper_daemon_unavailable", {}
+
+        try:
+            await asyncio.wait_for(done.wait(), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self._forget(request_id, timed_out=True)
+            self.cancel(process, request_id)
+            return None, "puppeteer_timeout", {}
+        except asyncio.CancelledError:
+            self._forget(request_id)
+            self.cancel(process, request_id)
+            raise
+        return self._result(waiter.message)
+
+    def cancel(self, process, request_id: str):
+        try:
+            self._send(process, {"op": "cancel", "id": request_id})
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+    def close(self):
+        with self._lock:
+            process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        kill_tree(process)
+
+    def stats(self):
+        with self._lock:
+            process = self._process
+            return {
+                "running": process is not None and process.poll() is None,
+                "child_pid": process.pid if process is not None else None,
+                "starts": self._starts,
+                "crashes": self._crashes,
+                "requests": self._requests,
+                "timeouts": self._timeouts,
+                "pending": len(self._pending),
+            }
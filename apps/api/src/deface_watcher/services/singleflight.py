@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_LOCK_POLL_SECONDS = 0.02
+_PRUNE_EVERY = 100
+_PRUNE_AGE_SECONDS = 600
+
+
+class _Call:
+    __slots__ = ("event", "value", "error", "callers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.callers = 1
+
+
+class _SharedResults:
+    def __init__(self, directory=None, wait_timeout: float = 60.0):
+        self._directory = str(directory) if directory and fcntl is not None else None
+        self._wait_timeout = wait_timeout
+        self._flights = 0
+        self._coalesced = 0
+        self._coalesced_across_workers = 0
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._directory, f"{digest}.lock"), os.path.join(self._directory, f"{digest}.json")
+
+    def _try_lock(self, handle):
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _lock_timed_out(self, handle):
+        logging.getLogger(__name__).warning("Single-flight lock wait timed out (%s).", handle.name)
+
+    def _read_result(self, path: str, arrived: float):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if payload.get("finished_at", 0) < arrived:
+            return None
+        return payload.get("value")
+
+    def _write_result(self, path: str, value):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"finished_at": time.time(), "value": value}, handle, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError):
+            logging.getLogger(__name__).warning("Could not share single-flight result (%s).", path, exc_info=True)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        cutoff = time.time() - _PRUNE_AGE_SECONDS
+        try:
+            entries = list(os.scandir(self._directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SingleFlight(_SharedResults):
+    def __init__(self, directory=None, wait_timeout: float = 60.0):
+        super().__init__(directory, wait_timeout)
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._flights += 1
+                prune = self._directory is not None and self._flights % _PRUNE_EVERY == 0
+            else:
+                call.callers += 1
+                self._coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True, call.callers
+
+        try:
+            call.value, shared = self._run(key, fn)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+            if prune:
+                self._prune()
+        return call.value, shared, call.callers
+
+    def _run(self, key: str, fn):
+        if self._directory is None:
+            return fn(), False
+
+        lock_path, result_path = self._paths(key)
+        arrived = time.time()
+        with open(lock_path, "a+") as handle:
+            locked = self._acquire(handle)
+            try:
+                if locked:
+                    os.utime(lock_path)
+                    value = self._read_result(result_path, arrived)
+                    if value is not None:
+                        with self._lock:
+                            self._coalesced_across_workers += 1
+                        return value, True
+                value = fn()
+                if locked:
+                    self._write_result(result_path, value)
+                return value, False
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _acquire(self, handle):
+        deadline = time.monotonic() + self._wait_timeout
+        while not self._try_lock(handle):
+            if time.monotonic() >= deadline:
+                self._lock_timed_out(handle)
+                return False
+            time.sleep(_LOCK_POLL_SECONDS)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "shared_dir": self._directory,
+                "flights": self._flights,
+                "in_flight": len(self._calls),
+                "coalesced": self._coalesced,
+                "coalesced_across_workers": self._coalesced_across_workers,
+            }
+
+
+class AsyncSingleFlight(_SharedResults):
+    def __init__(self, directory=None, wait_timeout: float = 60.0):
+        super().__init__(directory, wait_timeout)
+        self._calls = {}
+
+    async def do(self, key: str, fn):
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            call = [asyncio.ensure_future(self._run(key, fn)), 1]
+            self._calls[key] = call
+            self._flights += 1
+            call[0].add_done_callback(lambda _: self._calls.pop(key, None) if self._calls.get(key) is call else None)
+            if self._directory is not None and self._flights % _PRUNE_EVERY == 0:
+                self._prune()
+        else:
+            call[1] += 1
+            self._coalesced += 1
+
+        value, shared = await asyncio.shield(call[0])
+        return value, shared or not leader, call[1]
+
+    async def _run(self, key: str, fn):
+        if self._directory is None:
+            return await fn(), False
+
+        lock_path, result_path = self._paths(key)
+        arrived = time.time()
+        with open(lock_path, "a+") as handle:
+            # Polling the lock keeps the event loop free while another worker holds it.
+            locked = await self._acquire(handle)
+            try:
+                if locked:
+                    os.utime(lock_path)
+                    value = self._read_result(result_path, arrived)
+                    if value is not None:
+                        self._coalesced_across_workers += 1
+                        return value, True
+                value = await fn()
+                if locked:
+                    self._write_result(result_path, value)
+                return value, False
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    async def _acquire(self, handle):
+        deadline = time.monotonic() + self._wait_timeout
+        while not self._try_lock(handle):
+            if time.monotonic() >= deadline:
+                self._lock_timed_out(handle)
+                return False
+            await asyncio.sleep(_LOCK_POLL_SECONDS)
+        return True
+
+    def stats(self):
+        return {
+            "shared_dir": self._directory,
+            "flights": self._flights,
+            "in_flight": len(self._calls),
+            "coalesced": self._coalesced,
+            "coalesced_across_workers": self._coalesced_across_workers,
+        }
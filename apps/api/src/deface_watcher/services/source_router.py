@@ -0,0 +1,109 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WORD = re.compile(r"\w+")
+
+
+def text_similarity(first: str, second: str):
+    if not first and not second:
+        return 1.0
+    if not first or not second:
+        return 0.0
+    length_ratio = min(len(first), len(second)) / max(len(first), len(second))
+    first_words = set(_WORD.findall(first.lower()))
+    second_words = set(_WORD.findall(second.lower()))
+    union = first_words | second_words
+    overlap = len(first_words & second_words) / len(union) if union else 1.0
+    return round(min(length_ratio, overlap), 4)
+
+
+class _Host:
+    __slots__ = ("mode", "agreements", "checks", "probed_at", "similarity")
+
+    def __init__(self):
+        self.mode = "learning"
+        self.agreements = 0
+        self.checks = 0
+        self.probed_at = 0.0
+        self.similarity = None
+
+
+class SourceRouter:
+    def __init__(self, min_samples: int, min_similarity: float, reprobe_every: int, reprobe_interval: float, max_hosts: int):
+        self._min_samples = max(1, int(min_samples))
+        self._min_similarity = float(min_similarity)
+        self._reprobe_every = int(reprobe_every)
+        self._reprobe_interval = float(reprobe_interval)
+        self._max_hosts = max(1, int(max_hosts))
+        self._lock = threading.Lock()
+        self._hosts = OrderedDict()
+        self._decisions = {"requests": 0, "compare": 0, "default": 0}
+
+    def plan(self, host):
+        now = time.time()
+        if host is None:
+            with self._lock:
+                return self._decide("default", "no_host")
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = _Host()
+                self._hosts[host] = entry
+                while len(self._hosts) > self._max_hosts:
+                    self._hosts.popitem(last=False)
+            self._hosts.move_to_end(host)
+
+            if entry.mode == "learning":
+                return self._decide("compare", "learning", samples=entry.agreements, required=self._min_samples)
+
+            entry.checks += 1
+            due = (self._reprobe_every > 0 and entry.checks > self._reprobe_every) or (
+                self._reprobe_interval > 0 and now - entry.probed_at >= self._reprobe_interval
+            )
+            if due:
+                return self._decide("compare", "reprobe", mode=entry.mode, checks=entry.checks - 1)
+            if entry.mode == "static":
+                return self._decide("requests", "static_host", similarity=entry.similarity)
+            return self._decide("default", "dynamic_host", similarity=entry.similarity)
+
+    def _decide(self, decision: str, reason: str, **info):
+        self._decisions[decision] += 1
+        return {"decision": decision, "reason": reason, **info}
+
+    def observe(self, host, similarity: float):
+        if host is None:
+            return
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                return
+            entry.checks = 0
+            entry.probed_at = time.time()
+            entry.similarity = similarity
+            if similarity >= self._min_similarity:
+                entry.agreements += 1
+                if entry.mode != "static":
+                    entry.mode = "static" if entry.agreements >= self._min_samples else "learning"
+            else:
+                entry.mode = "dynamic"
+                entry.agreements = 0
+
+    def demote(self, host):
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is not None:
+                entry.mode = "learning"
+                entry.agreements = 0
+
+    def stats(self):
+        with self._lock:
+            modes = [entry.mode for entry in self._hosts.values()]
+            return {
+                "hosts": len(modes),
+                "static": modes.count("static"),
+                "dynamic": modes.count("dynamic"),
+                "learning": modes.count("learning"),
+                "decisions": dict(self._decisions),
+            }
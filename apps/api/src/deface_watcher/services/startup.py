@@ -0,0 +1,191 @@
+import gc
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+
+from ..config import load_settings
+from .artifacts import get_artifacts, get_load_ms, load_tokenizer, load_versioned_tokenizer, warm_up
+from .predictor import get_sidecar
+
+_SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+_SIDECAR_POLL_SECONDS = 0.5
+
+_LOCK = Lock()
+_MASTER = {"pid": None, "preload_ms": None, "warmup_ms": None, "model_preloaded": False}
+_WORKER = {
+    "pid": None,
+    "state": "lazy",
+    "stage": None,
+    "started_at": None,
+    "cold_start_ms": None,
+    "warmup_ms": None,
+    "error": None,
+}
+_READY = Event()
+
+
+def _warm_up(settings):
+    sizes = [size for size in settings.warmup_batch_sizes if size > 0]
+    return warm_up(sizes) if sizes else {}
+
+
+def preload():
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    start = time.time()
+    load_tokenizer()
+    # TensorFlow's thread pools do not survive fork(); only the pure-NumPy engine is safe to share.
+    model_preloaded = settings.inference_engine == "numpy" and not settings.inference_socket
+    warmup_ms = None
+    if model_preloaded:
+        get_artifacts()
+        warmup_ms = _warm_up(settings)
+    gc.collect()
+    # Keep the collector from touching (and so copying) every preloaded object in each worker.
+    gc.freeze()
+    with _LOCK:
+        _MASTER.update(
+            pid=os.getpid(),
+            preload_ms=round((time.time() - start) * 1000, 1),
+            warmup_ms=warmup_ms,
+            model_preloaded=model_preloaded,
+        )
+    logger.info("Preloaded artifacts in master (pid=%s, model=%s).", os.getpid(), model_preloaded)
+
+
+def _begin_load():
+    with _LOCK:
+        if _WORKER["pid"] == os.getpid():
+            return False
+        _WORKER.update(
+            pid=os.getpid(),
+            state="loading",
+            stage=None,
+            started_at=time.time(),
+            cold_start_ms=None,
+            warmup_ms=None,
+            error=None,
+        )
+        _READY.clear()
+        return True
+
+
+def _set_stage(stage: str):
+    with _LOCK:
+        _WORKER["stage"] = stage
+
+
+def _wait_for_sidecar(settings):
+    sidecar = get_sidecar(settings)
+    if sidecar is None:
+        return False
+    _set_stage("sidecar")
+    deadline = time.monotonic() + settings.inference_sidecar_wait
+    while not sidecar.ping():
+        if time.monotonic() >= deadline:
+            logging.getLogger(__name__).warning(
+                "Inference sidecar not reachable at %s, loading the model in-process.", settings.inference_socket
+            )
+            return False
+        time.sleep(_SIDECAR_POLL_SECONDS)
+    return True
+
+
+def _load():
+    settings = load_settings()
+    logger = logging.getLogger(__name__)
+    try:
+        _set_stage("tokenizer")
+        load_tokenizer()
+        warmup_ms = None
+        if _wait_for_sidecar(settings):
+            load_versioned_tokenizer()
+        else:
+            _set_stage("model")
+            get_artifacts()
+            _set_stage("warmup")
+            warmup_ms = _warm_up(settings)
+    except Exception as exc:
+        logger.exception("Loading artifacts failed (pid=%s).", os.getpid())
+        with _LOCK:
+            _WORKER.update(state="failed", error=f"{type(exc).__name__}: {exc}")
+        # Waiting requests fall through to the lazy path, which reports the error itself.
+        _READY.set()
+        return
+
+    with _LOCK:
+        _WORKER.update(
+            state="ready",
+            stage=None,
+            cold_start_ms=round((time.time() - _WORKER["started_at"]) * 1000, 1),
+            warmup_ms=warmup_ms,
+        )
+    _READY.set()
+    logger.info("Worker ready (pid=%s, cold_start_ms=%s).", os.getpid(), _WORKER["cold_start_ms"])
+
+
+def start_background_load():
+    if _begin_load():
+        Thread(target=_load, name="artifacts-loader", daemon=True).start()
+
+
+def wait_ready(timeout=None):
+    with _LOCK:
+        loading = _WORKER["pid"] == os.getpid() and _WORKER["state"] == "loading"
+    return not loading or _READY.wait(timeout)
+
+
+def get_readiness():
+    with _LOCK:
+        worker = dict(_WORKER) if _WORKER["pid"] == os.getpid() else None
+    if worker is None:
+        return {"ready": True, "state": "lazy", "pid": os.getpid()}
+    elapsed_ms = worker["cold_start_ms"]
+    if elapsed_ms is None:
+        elapsed_ms = round((time.time() - worker["started_at"]) * 1000, 1)
+    return {
+        "ready": worker["state"] == "ready",
+        "state": worker["state"],
+        "stage": worker["stage"],
+        "elapsed_ms": elapsed_ms,
+        "error": worker["error"],
+        "pid": os.getpid(),
+    }
+
+
+def memory_usage():
+    try:
+        with open(_SMAPS_ROLLUP, "r", encoding="ascii") as handle:
+            lines = handle.readlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            fields[parts[0].rstrip(":")] = int(parts[1])
+
+    def megabytes(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+
+    return {
+        "rss_mb": megabytes("Rss"),
+        "pss_mb": megabytes("Pss"),
+        "shared_mb": megabytes("Shared_Clean", "Shared_Dirty"),
+        "private_mb": megabytes("Private_Clean", "Private_Dirty"),
+    }
+
+
+def get_startup_stats():
+    with _LOCK:
+        master = dict(_MASTER)
+        worker = dict(_WORKER) if _WORKER["pid"] == os.getpid() else None
+    return {
+        "pid": os.getpid(),
+        "preloaded": master["pid"] is not None and master["pid"] != os.getpid(),
+        "master": master if master["pid"] is not None else None,
+        "worker": worker,
+        "artifacts_load_ms": get_load_ms(),
+        "memory": memory_usage(),
+    }
@@ -0,0 +1,172 @@
+import json
+import struct
+
+import numpy as np
+
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+_CHUNK_CHARS = 2048
+
+# Compact vocabulary written by step2_tokenize_data.py:
+# magic | uint32 header size | JSON header | pad to 4 | uint32 offsets[count + 1] | int32 indices[count] | utf-8 words
+VOCAB_MAGIC = b"DWVOCAB1"
+_HEADER_STRUCT = struct.Struct("<8sI")
+
+
+def write_vocab_artifact(path, word_index: dict, num_words=None, oov_token=None, **config):
+    entries = sorted(
+        (word.encode("utf-8"), int(index))
+        for word, index in word_index.items()
+        if not num_words or index < num_words
+    )
+    header = {**config, "num_words": num_words, "oov_token": oov_token, "count": len(entries)}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    offsets = np.zeros(len(entries) + 1, dtype="<u4")
+    np.cumsum([len(word) for word, _ in entries], out=offsets[1:])
+    indices = np.array([index for _, index in entries], dtype="<i4")
+
+    with open(path, "wb") as handle:
+        handle.write(_HEADER_STRUCT.pack(VOCAB_MAGIC, len(header_bytes)))
+        handle.write(header_bytes)
+        handle.write(b"\0" * (-(_HEADER_STRUCT.size + len(header_bytes)) % 4))
+        handle.write(offsets.tobytes())
+        handle.write(indices.tobytes())
+        handle.write(b"".join(word for word, _ in entries))
+    return len(entries)
+
+
+def read_vocab_artifact(path):
+    # Every word ends up in a dict anyway, so read the file once and decode the words in a single pass.
+    with open(path, "rb") as handle:
+        buffer = handle.read()
+    magic, header_size = _HEADER_STRUCT.unpack_from(buffer, 0)
+    if magic != VOCAB_MAGIC:
+        raise ValueError(f"Not a vocabulary artifact: {path}")
+    position = _HEADER_STRUCT.size
+    header = json.loads(buffer[position : position + header_size].decode("utf-8"))
+    position += header_size
+    position += -position % 4
+
+    count = int(header["count"])
+    offsets = np.frombuffer(buffer, dtype="<u4", count=count + 1, offset=position).astype(np.int64)
+    position += 4 * (count + 1)
+    indices = np.frombuffer(buffer, dtype="<i4", count=count, offset=position).tolist()
+    position += 4 * count
+
+    blob = np.frombuffer(buffer, dtype=np.uint8, count=int(offsets[-1]), offset=position)
+    text = blob.tobytes().decode("utf-8")
+    if len(text) != len(blob):
+        # Byte offsets become character offsets once the UTF-8 continuation bytes before them are dropped.
+        continuation = np.concatenate(([0], np.cumsum((blob & 0xC0) == 0x80)))
+        offsets = offsets - continuation[offsets]
+    offsets = offsets.tolist()
+    words = [text[offsets[i] : offsets[i + 1]] for i in range(count)]
+    return header, dict(zip(words, indices))
+
+
+class VocabTokenizer:
+    def __init__(
+        self,
+        word_index: dict,
+        num_words=None,
+        oov_token=None,
+        filters: str = DEFAULT_FILTERS,
+        lower: bool = True,
+        split: str = " ",
+        char_level: bool = False,
+    ):
+        if char_level:
+            raise ValueError("char_level tokenizers are not supported")
+
+        self.num_words = num_words
+        self.oov_token = oov_token
+        self.lower = lower
+        self.split = split
+        self._translate_map = str.maketrans({char: split for char in filters})
+        # Chunk boundaries are only safe on whitespace: str.lower() is context-sensitive (final sigma).
+        self._chunked = len(split) == 1 and split.isspace()
+
+        oov_index = word_index.get(oov_token) if oov_token is not None else None
+        self._unknown_index = oov_index
+        self._lookup = {}
+        for word, index in word_index.items():
+            if num_words and index >= num_words:
+                index = oov_index
+            if index is not None:
+                self._lookup[word] = index
+        self.vocab_size = len(self._lookup)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        word_index = config["word_index"]
+        if isinstance(word_index, str):
+            word_index = json.loads(word_index)
+        return cls(
+            word_index,
+            num_words=config.get("num_words"),
+            oov_token=config.get("oov_token"),
+            filters=config.get("filters", DEFAULT_FILTERS),
+            lower=config.get("lower", True),
+            split=config.get("split", " "),
+            char_level=config.get("char_level", False),
+        )
+
+    @classmethod
+    def from_vocab_file(cls, path):
+        header, word_index = read_vocab_artifact(path)
+        return cls.from_config({**header, "word_index": word_index})
+
+    @classmethod
+    def from_json(cls, json_string: str):
+        payload = json.loads(json_string)
+        return cls.from_config(payload.get("config", payload))
+
+    def _words(self, segment: str):
+        if self.lower:
+            segment = segment.lower()
+        return [word for word in segment.translate(self._translate_map).split(self.split) if word]
+
+    def _iter_words(self, text: str):
+        size = len(text)
+        if not self._chunked or size <= _CHUNK_CHARS:
+            yield from self._words(text)
+            return
+
+        start = 0
+        while start < size:
+            end = start + _CHUNK_CHARS
+            if end < size:
+                cut = text.rfind(self.split, start, end)
+                if cut == -1:
+                    cut = text.find(self.split, end)
+                end = size if cut == -1 else cut + 1
+            yield from self._words(text[start:end])
+            start = end
+
+    def encode_into(self, text: str, out) -> int:
+        max_length = len(out)
+        if not text or not max_length:
+            return 0
+
+        lookup = self._lookup
+        unknown_index = self._unknown_index
+        count = 0
+        for word in self._iter_words(text):
+            index = lookup.get(word, unknown_index)
+            if index is None:
+                continue
+            out[count] = index
+            count += 1
+            if count == max_length:
+                break
+        return count
+
+    def encode_batch(self, texts, max_length: int):
+        texts = list(texts)
+        encoded = np.zeros((len(texts), max_length), dtype=np.int32)
+        for row, text in enumerate(texts):
+            self.encode_into(text if isinstance(text, str) else "", encoded[row])
+        return encoded
+
+    def encode(self, text: str, max_length: int):
+        return self.encode_batch([text], max_length)
@@ -3,9 +3,12 @@ import os
 import warnings
 from flask import Flask
 
-from .api import api_bp
+from .api import api_bp, start_job_workers
 from .config import configure_logging, load_settings
 from .routes import ui_bp
+from .services import metrics
+from .services.artifacts import start_watcher
+from .services.startup import preload, start_background_load
 
 
 def create_app():
@@ -29,10 +32,30 @@ def create_app():
 
     app.register_blueprint(ui_bp)
     app.register_blueprint(api_bp)
+    if settings.preload_artifacts:
+        # Forking servers call init_worker() in each child; nothing here may start threads.
+        preload()
+    else:
+        _start_metrics(settings)
+        if settings.load_on_boot:
+            start_background_load()
+        start_watcher(settings.model_watch_interval)
 
     return app
 
 
+def _start_metrics(settings):
+    metrics.configure(settings.metrics_enabled, settings.metrics_dir, settings.metrics_flush_interval)
+
+
+def init_worker():
+    _start_metrics(load_settings())
+    # Loading in the background keeps the worker answering gunicorn's heartbeat; /ready reports when it is done.
+    start_background_load()
+    start_watcher(load_settings().model_watch_interval)
+
+
 if __name__ == "__main__":
     application = create_app()
+    start_job_workers()
     application.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
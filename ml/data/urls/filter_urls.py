@@ -6,6 +6,11 @@ from pathlib import Path
 import requests
 
 BASE_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BASE_DIR.parents[2]
+sys.path.insert(0, str(ROOT_DIR / "apps" / "api" / "src"))
+
+from deface_watcher.services.http_client import get_http_stats, get_session  # noqa: E402
+
 INPUT_FILE = BASE_DIR / "defacement_url.txt"
 OUTPUT_FILE = BASE_DIR / "defacement_url_valid.txt"
 ERROR_FILE = BASE_DIR / "defacement_url_errors.txt"
@@ -23,7 +28,8 @@ REQUEST_HEADERS = {
 
 def is_url_accessible(url, timeout=TIMEOUT):
     try:
-        response = requests.get(url, headers=REQUEST_HEADERS, allow_redirects=True, timeout=timeout)
+        session = get_session(pool_maxsize=MAX_WORKERS)
+        response = session.get(url, headers=REQUEST_HEADERS, allow_redirects=True, timeout=timeout)
         return response.status_code < 400
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
         return False
@@ -79,6 +85,8 @@ def main():
     print("\n--- DONE ---")
     print(f"Valid URLs saved to: {OUTPUT_FILE}")
     print(f"Invalid URLs saved to: {ERROR_FILE}")
+    http_stats = get_http_stats()
+    print(f"HTTP: {http_stats['requests']} requests, {http_stats['connections_reused']} reused connections")
 
 
 if __name__ == "__main__":
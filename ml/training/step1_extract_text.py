@@ -2,6 +2,7 @@ import json
 import os
 import random
 import subprocess
+import sys
 import time
 import warnings
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -13,8 +14,12 @@ import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
-# --- CONFIG ---
 ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR / "apps" / "api" / "src"))
+
+from deface_watcher.services.http_client import get_http_stats, get_session  # noqa: E402
+
+# --- CONFIG ---
 URLS_DIR = ROOT_DIR / "ml" / "data" / "urls"
 RAW_DIR = ROOT_DIR / "ml" / "data" / "raw"
 DEFACED_URL_FILE = URLS_DIR / "defacement_url.txt"
@@ -234,7 +239,7 @@ def extract_text_fallback(url):
         start = time.time()
         meta = {"errors": [], "timings": {}, "http_status": None, "final_url": None}
         try:
-            response = requests.get(
+            response = get_session(pool_maxsize=MAX_WORKERS).get(
                 url,
                 headers=REQUEST_HEADERS,
                 timeout=REQUEST_TIMEOUT,
@@ -384,6 +389,12 @@ def main():
     print(f"Failed: {failed}")
     print(f"Success by method: {success_by_method}")
     print(f"Truncated samples: {truncated_count}")
+    http_stats = get_http_stats()
+    if http_stats["requests"]:
+        print(
+            f"Fallback HTTP: {http_stats['requests']} requests, "
+            f"{http_stats['connections_reused']} reused connections, DNS hit ratio {http_stats['dns_hit_ratio']}"
+        )
     if ENABLE_META and scrape_times:
         print(f"Avg scrape time (ms): {mean(scrape_times):.2f}")
         print(f"Median scrape time (ms): {median(scrape_times):.2f}")
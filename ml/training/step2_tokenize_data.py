@@ -1,6 +1,7 @@
 import json
 import random
 import re
+import sys
 from pathlib import Path
 
 import numpy as np
@@ -10,6 +11,9 @@ from tensorflow.keras.preprocessing.text import Tokenizer
 import unicodedata
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR / "apps" / "api" / "src"))
+
+from deface_watcher.services.tokenizer import write_vocab_artifact  # noqa: E402
 
 # --- CONFIG ---
 INPUT_FILE = ROOT_DIR / "ml" / "data" / "raw" / "rawData.json"
@@ -21,6 +25,7 @@ OUTPUT_Y_VALID = ROOT_DIR / "ml" / "data" / "processed" / "y_valid.npy"
 OUTPUT_X_TEST = ROOT_DIR / "ml" / "data" / "processed" / "X_test.npy"
 OUTPUT_Y_TEST = ROOT_DIR / "ml" / "data" / "processed" / "y_test.npy"
 OUTPUT_TOKENIZER = ROOT_DIR / "ml" / "artifacts" / "tokenizer.json"
+OUTPUT_VOCAB = ROOT_DIR / "ml" / "artifacts" / "tokenizer_vocab.bin"
 
 MAX_LENGTH = 128
 VOCAB_SIZE = 20000
@@ -134,6 +139,17 @@ except json.JSONDecodeError:
     with OUTPUT_TOKENIZER.open("w", encoding="utf-8") as handle:
         handle.write(tokenizer_json_string)
 
+vocab_count = write_vocab_artifact(
+    OUTPUT_VOCAB,
+    tokenizer.word_index,
+    num_words=tokenizer.num_words,
+    oov_token=tokenizer.oov_token,
+    filters=tokenizer.filters,
+    lower=tokenizer.lower,
+    split=tokenizer.split,
+    char_level=tokenizer.char_level,
+)
+
 print("Saved splits:")
 print(f"  X_train: {X_train.shape} -> {OUTPUT_X_TRAIN}")
 print(f"  y_train: {y_train.shape} -> {OUTPUT_Y_TRAIN}")
@@ -142,4 +158,5 @@ print(f"  y_valid: {y_valid.shape} -> {OUTPUT_Y_VALID}")
 print(f"  X_test:  {X_test.shape} -> {OUTPUT_X_TEST}")
 print(f"  y_test:  {y_test.shape} -> {OUTPUT_Y_TEST}")
 print(f"Tokenizer: {OUTPUT_TOKENIZER}")
+print(f"Vocabulary: {OUTPUT_VOCAB} ({vocab_count} words, {OUTPUT_VOCAB.stat().st_size / 1024:.1f} KB)")
 print("--- STEP 2 COMPLETE ---")
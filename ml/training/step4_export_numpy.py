@@ -0,0 +1,86 @@
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+from tensorflow.keras.layers import Bidirectional, Dense, Embedding
+from tensorflow.keras.models import load_model
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR / "apps" / "api" / "src"))
+
+from deface_watcher.services.numpy_engine import NumpyBiLSTM  # noqa: E402
+
+# --- CONFIG ---
+INPUT_MODEL = Path(os.getenv("MODEL_PATH", ROOT_DIR / "ml" / "artifacts" / "bilstm_defacement_model.keras"))
+INPUT_X_TEST = ROOT_DIR / "ml" / "data" / "processed" / "X_test.npy"
+OUTPUT_WEIGHTS = Path(os.getenv("NUMPY_WEIGHTS_PATH", ROOT_DIR / "ml" / "artifacts" / "bilstm_weights.npz"))
+
+MAX_LENGTH = 128
+PARITY_SAMPLES = 256
+PARITY_TOLERANCE = 1e-4
+SEED = 42
+# ----------------
+
+
+def find_layer(model, layer_type):
+    for layer in model.layers:
+        if isinstance(layer, layer_type):
+            return layer
+    print(f"ERROR: Model has no {layer_type.__name__} layer.")
+    raise SystemExit(1)
+
+
+print("--- STEP 4: EXPORT WEIGHTS FOR NUMPY INFERENCE ---")
+
+if not INPUT_MODEL.exists():
+    print(f"ERROR: Missing model file {INPUT_MODEL}")
+    raise SystemExit(1)
+
+model = load_model(INPUT_MODEL)
+embedding = find_layer(model, Embedding)
+bilstm = find_layer(model, Bidirectional)
+dense = find_layer(model, Dense)
+
+forward_kernel, forward_recurrent_kernel, forward_bias = bilstm.forward_layer.get_weights()
+backward_kernel, backward_recurrent_kernel, backward_bias = bilstm.backward_layer.get_weights()
+dense_kernel, dense_bias = dense.get_weights()
+
+weights = {
+    "embedding": embedding.get_weights()[0],
+    "forward_kernel": forward_kernel,
+    "forward_recurrent_kernel": forward_recurrent_kernel,
+    "forward_bias": forward_bias,
+    "backward_kernel": backward_kernel,
+    "backward_recurrent_kernel": backward_recurrent_kernel,
+    "backward_bias": backward_bias,
+    "dense_kernel": dense_kernel,
+    "dense_bias": dense_bias,
+}
+weights = {key: np.asarray(value, dtype=np.float32) for key, value in weights.items()}
+
+OUTPUT_WEIGHTS.parent.mkdir(parents=True, exist_ok=True)
+np.savez(str(OUTPUT_WEIGHTS), **weights)
+print(f"Weights: {OUTPUT_WEIGHTS} ({OUTPUT_WEIGHTS.stat().st_size / 1024:.1f} KB)")
+
+if INPUT_X_TEST.exists():
+    samples = np.load(str(INPUT_X_TEST))[:PARITY_SAMPLES].astype(np.int32)
+else:
+    rng = np.random.default_rng(SEED)
+    vocab_size = weights["embedding"].shape[0]
+    samples = rng.integers(0, vocab_size, size=(PARITY_SAMPLES, MAX_LENGTH), dtype=np.int32)
+
+engine = NumpyBiLSTM.load(OUTPUT_WEIGHTS)
+keras_probs = model.predict(samples, verbose=0)
+numpy_probs = engine.predict(samples)
+max_diff = float(np.max(np.abs(keras_probs - numpy_probs)))
+same_class = float(np.mean(np.argmax(keras_probs, axis=1) == np.argmax(numpy_probs, axis=1)))
+print(f"Parity on {len(samples)} samples: max_abs_diff={max_diff:.2e} class_agreement={same_class * 100:.2f}%")
+
+if max_diff > PARITY_TOLERANCE:
+    print(f"ERROR: NumPy engine differs from Keras by more than {PARITY_TOLERANCE}.")
+    raise SystemExit(1)
+
+print("--- STEP 4 COMPLETE ---")
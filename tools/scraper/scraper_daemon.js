@@ -0,0 +1,203 @@
+const readline = require("readline");
+const puppeteer = require("puppeteer");
+
+const POOL_SIZE = Math.max(1, Number(process.env.SCRAPER_POOL_SIZE || 2));
+const MAX_PAGES_PER_BROWSER = Math.max(1, Number(process.env.SCRAPER_MAX_PAGES_PER_BROWSER || 50));
+const PAGE_TIMEOUT = Number(process.env.SCRAPER_PAGE_TIMEOUT_MS || 12000);
+const SETTLE_MS = Number(process.env.PUPPETEER_SETTLE_MS || 250);
+const MAX_CHARS = Number(process.env.MAX_TEXT_LEN || 20000);
+const BLOCKED_TYPES = ["image", "stylesheet", "font", "media"];
+
+function normalizeText(text) {
+  if (!text) {
+    return "";
+  }
+  const cleaned = text.replace(/\s+/g, " ").trim();
+  return cleaned.length > MAX_CHARS ? cleaned.slice(0, MAX_CHARS) : cleaned;
+}
+
+function send(message) {
+  process.stdout.write(`${JSON.stringify(message)}\n`);
+}
+
+function errorMessage(error) {
+  return error && error.message ? error.message : String(error);
+}
+
+async function launchBrowser() {
+  return puppeteer.launch({
+    headless: "new",
+    executablePath: process.env.PUPPETEER_EXECUTABLE_PATH || undefined,
+    args: ["--no-sandbox", "--disable-setuid-sandbox", "--disable-dev-shm-usage"],
+  });
+}
+
+async function createContext(browser) {
+  if (typeof browser.createBrowserContext === "function") {
+    return browser.createBrowserContext();
+  }
+  return browser.createIncognitoBrowserContext();
+}
+
+class Slot {
+  constructor(index) {
+    this.index = index;
+    this.browser = null;
+    this.pages = 0;
+    this.busy = false;
+    this.context = null;
+    this.launching = null;
+  }
+
+  async ensureBrowser() {
+    if (this.launching) {
+      return this.launching;
+    }
+    if (this.browser && this.browser.isConnected() && this.pages < MAX_PAGES_PER_BROWSER) {
+      return this.browser;
+    }
+    this.launching = (async () => {
+      await this.closeBrowser();
+      this.browser = await launchBrowser();
+      this.pages = 0;
+      return this.browser;
+    })();
+    try {
+      return await this.launching;
+    } finally {
+      this.launching = null;
+    }
+  }
+
+  async closeBrowser() {
+    const browser = this.browser;
+    this.browser = null;
+    if (browser) {
+      await browser.close().catch(() => {});
+    }
+  }
+
+  async abort() {
+    const context = this.context;
+    this.context = null;
+    if (context) {
+      await context.close().catch(() => {});
+    }
+  }
+
+  async getText(url, timeoutMs) {
+    const browser = await this.ensureBrowser();
+    this.pages += 1;
+    const context = await createContext(browser);
+    this.context = context;
+    try {
+      const page = await context.newPage();
+      await page.setViewport({ width: 1365, height: 768 });
+      await page.setRequestInterception(true);
+      page.on("request", (req) => {
+        if (BLOCKED_TYPES.includes(req.resourceType())) {
+          req.abort();
+        } else {
+          req.continue();
+        }
+      });
+
+      const response = await page.goto(url, { waitUntil: "domcontentloaded", timeout: timeoutMs });
+      await new Promise((resolve) => setTimeout(resolve, SETTLE_MS));
+      const text = await page.evaluate(() => (document.body ? document.body.innerText || "" : ""));
+      const headers = response ? response.headers() : {};
+      return {
+        text: normalizeText(text),
+        httpStatus: response ? response.status() : null,
+        finalUrl: page.url(),
+        etag: headers.etag || null,
+        lastModified: headers["last-modified"] || null,
+      };
+    } finally {
+      this.context = null;
+      await context.close().catch(() => {});
+    }
+  }
+}
+
+const slots = Array.from({ length: POOL_SIZE }, (_, index) => new Slot(index));
+const queue = [];
+const running = new Map();
+
+function dispatch() {
+  for (const slot of slots) {
+    if (slot.busy || queue.length === 0) {
+      continue;
+    }
+    const job = queue.shift();
+    slot.busy = true;
+    running.set(job.id, slot);
+    slot
+      .getText(job.url, job.timeoutMs)
+      .then((result) => send({ id: job.id, ok: true, ...result }))
+      .catch((error) => {
+        send({ id: job.id, ok: false, error: `Puppeteer error: ${errorMessage(error)}` });
+        if (!slot.browser || !slot.browser.isConnected()) {
+          return slot.closeBrowser();
+        }
+        return undefined;
+      })
+      .finally(() => {
+        running.delete(job.id);
+        slot.busy = false;
+        dispatch();
+      });
+  }
+}
+
+function cancel(id) {
+  const index = queue.findIndex((job) => job.id === id);
+  if (index !== -1) {
+    queue.splice(index, 1);
+    send({ id, ok: false, error: "cancelled" });
+    return;
+  }
+  const slot = running.get(id);
+  if (slot) {
+    slot.abort();
+  }
+}
+
+function handleLine(line) {
+  if (!line.trim()) {
+    return;
+  }
+  let message;
+  try {
+    message = JSON.parse(line);
+  } catch (error) {
+    console.error(`Invalid message: ${errorMessage(error)}`);
+    return;
+  }
+  if (message.op === "cancel") {
+    cancel(message.id);
+    return;
+  }
+  if (!message.id || !message.url) {
+    send({ id: message.id || null, ok: false, error: "Missing id or url." });
+    return;
+  }
+  queue.push({ id: message.id, url: message.url, timeoutMs: Number(message.timeoutMs) || PAGE_TIMEOUT });
+  dispatch();
+}
+
+async function shutdown() {
+  await Promise.all(slots.map((slot) => slot.closeBrowser()));
+  process.exit(0);
+}
+
+const input = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+input.on("line", handleLine);
+input.on("close", shutdown);
+process.on("SIGTERM", shutdown);
+
+Promise.all(
+  slots.map((slot) =>
+    slot.ensureBrowser().catch((error) => console.error(`Browser warm-up failed: ${errorMessage(error)}`))
+  )
+).then(() => send({ event: "ready", poolSize: POOL_SIZE, maxPagesPerBrowser: MAX_PAGES_PER_BROWSER }));